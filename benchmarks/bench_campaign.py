@@ -0,0 +1,61 @@
+"""Throughput benchmark for the call dispatcher against the local VAPI stub.
+
+Dials `--calls` fake numbers through campaign.CallDispatcher (no database involved) and
+reports calls per second, attempts and latency percentiles.
+
+    python benchmarks/bench_campaign.py --calls 200 --concurrency 8 --rate 50 --rate-limited 0.1
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import campaign  # noqa: E402
+import vapi_stub  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=50, help="call requests per second")
+    parser.add_argument('--burst', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--rate-limited', type=float, default=0.0)
+    parser.add_argument('--errors', type=float, default=0.0)
+    args = parser.parse_args()
+
+    # Retry-After 0 keeps the benchmark about dispatch rather than waiting
+    server, state = vapi_stub.start(latency=args.latency, rate_limited=args.rate_limited,
+                                    errors=args.errors, retry_after=0)
+    dispatcher = campaign.CallDispatcher(f"http://127.0.0.1:{server.server_port}", rate=args.rate,
+                                         burst=args.burst, concurrency=args.concurrency)
+    numbers = [f"+1555{index:07d}" for index in range(args.calls)]
+    twilio_config = {'twilioPhoneNumber': '+15550000000'}
+
+    def dial(number):
+        started = time.perf_counter()
+        outcome = dispatcher.dial(number, "Benchmark call", twilio_config)
+        return outcome, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(dial, numbers))
+    elapsed = time.perf_counter() - started
+    dispatcher.close()
+    server.shutdown()
+
+    placed = sum(1 for outcome, _ in results if outcome['status'] == 'placed')
+    attempts = sum(outcome['attempts'] for outcome, _ in results)
+    latencies = sorted(latency for _, latency in results)
+    print(f"{placed}/{args.calls} placed in {elapsed:.2f}s ({args.calls / elapsed:.1f} calls/s), "
+          f"{attempts} requests, stub responses {state.counts}")
+    print(f"p50={latencies[len(latencies) // 2] * 1000:.0f}ms  "
+          f"p95={latencies[int(len(latencies) * 0.95)] * 1000:.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
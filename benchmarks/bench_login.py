@@ -0,0 +1,77 @@
+"""Load benchmark for the login and profile endpoints of a running server.
+
+Each simulated user logs in once (POST /authenticateUser), then requests /profile
+repeatedly with the same session. Reports latency percentiles and throughput per endpoint.
+
+    python benchmarks/bench_login.py --url http://localhost:5000 --email a@b.com --password secret123
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_user(args, timings, lock):
+    session = requests.Session()
+    local = {'login': [], 'profile': [], 'errors': 0}
+
+    for _ in range(args.logins):
+        started = time.perf_counter()
+        response = session.post(f"{args.url}/authenticateUser",
+                                data={'username': args.email, 'password': args.password})
+        local['login'].append(time.perf_counter() - started)
+        if response.status_code != 200 or 'Invalid credentials' in response.text:
+            local['errors'] += 1
+
+        for _ in range(args.profiles):
+            started = time.perf_counter()
+            response = session.get(f"{args.url}/profile", allow_redirects=False)
+            local['profile'].append(time.perf_counter() - started)
+            if response.status_code != 200:
+                local['errors'] += 1
+
+    with lock:
+        for name in ('login', 'profile'):
+            timings[name].extend(local[name])
+        timings['errors'] += local['errors']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--concurrency', type=int, default=16, help="simulated users")
+    parser.add_argument('--logins', type=int, default=10, help="logins per user")
+    parser.add_argument('--profiles', type=int, default=5, help="profile reads after each login")
+    args = parser.parse_args()
+
+    timings = {'login': [], 'profile': [], 'errors': 0}
+    lock = threading.Lock()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for future in [executor.submit(run_user, args, timings, lock) for _ in range(args.concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    total = len(timings['login']) + len(timings['profile'])
+    print(f"{total} requests in {elapsed:.2f}s ({total / elapsed:.1f} req/s), {timings['errors']} errors")
+    for name in ('login', 'profile'):
+        samples = timings[name]
+        if not samples:
+            continue
+        print(f"{name:8} n={len(samples):6}  mean={statistics.mean(samples) * 1000:7.1f}ms  "
+              f"p50={percentile(samples, 50) * 1000:7.1f}ms  p95={percentile(samples, 95) * 1000:7.1f}ms  "
+              f"p99={percentile(samples, 99) * 1000:7.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Scraper benchmark against the offline Maps fixture (benchmarks/maps_fixture.py).
+
+Runs scrape_data for every combination of --totals and --fanouts and reports listings per
+second, per-phase latency (see scraper.iter_scrape) and peak memory of this process and of
+its browser processes. With --min-rate the exit status is 1 when any run is slower, so it
+can gate scraper changes; --json writes the raw numbers for comparison between runs.
+With --shared-names adjacent fixture places share a name (chain stores), and the exit status
+is also 1 when any run returns fewer rows than it asked for.
+
+    python benchmarks/bench_scraper.py --totals 10,50,100 --fanouts 1,4 --latency 0.02
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import maps_fixture  # noqa: E402
+
+
+def _children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def _tree_rss_mb(pid):
+    # Resident memory of every descendant of `pid` (the Playwright driver and its browsers)
+    total = 0
+    stack = _children(pid)
+    while stack:
+        child = stack.pop()
+        stack.extend(_children(child))
+        try:
+            with open(f'/proc/{child}/statm') as f:
+                total += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            pass
+    return total / 1024 / 1024
+
+
+class PeakSampler:
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, _tree_rss_mb(os.getpid()))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--totals', default='10,50,100', help="comma-separated result counts")
+    parser.add_argument('--fanouts', default='1,4', help="comma-separated detail fan-outs")
+    parser.add_argument('--repeat', type=int, default=1, help="runs per combination (the fastest is kept)")
+    parser.add_argument('--latency', type=float, default=0.02, help="fixture seconds per response")
+    parser.add_argument('--feed-length', type=int, default=120)
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--term', default="pizza in lahore")
+    parser.add_argument('--shared-names', action='store_true',
+                        help="adjacent places share a name; fail when any of them is dropped")
+    parser.add_argument('--min-rate', type=float, help="fail when any run extracts fewer listings per second")
+    parser.add_argument('--json', help="write the results to this file")
+    args = parser.parse_args()
+
+    server, state, url = maps_fixture.start(latency=args.latency, feed_length=args.feed_length,
+                                            page_size=args.page_size, shared_names=args.shared_names)
+    # Must be set before the scraper reads its configuration
+    os.environ['MAPS_BASE_URL'] = url
+    from browser_pool import close_pool, get_pool
+    import scraper
+
+    get_pool().warm()
+    # One unmeasured run so the detail threads' browsers are launched as well
+    scraper.scrape_data(args.term, total=5, fanout=max(int(f) for f in args.fanouts.split(',')))
+
+    results = []
+    for total in (int(t) for t in args.totals.split(',')):
+        for fanout in (int(f) for f in args.fanouts.split(',')):
+            best = None
+            for _ in range(args.repeat):
+                timings = {}
+                with PeakSampler() as sampler:
+                    started = time.perf_counter()
+                    df = scraper.scrape_data(args.term, total=total, fanout=fanout, timings=timings)
+                    elapsed = time.perf_counter() - started
+                rows = 0 if df is None else len(df)
+                run = {
+                    'total': total, 'fanout': fanout, 'rows': rows, 'seconds': round(elapsed, 3),
+                    'listings_per_second': round(rows / elapsed, 2) if elapsed else 0.0,
+                    'phases': {phase: round(value, 3) for phase, value in timings.items()},
+                    'browser_peak_mb': round(sampler.peak_mb, 1),
+                    'python_peak_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                }
+                if best is None or run['listings_per_second'] > best['listings_per_second']:
+                    best = run
+            results.append(best)
+            phases = '  '.join(f"{phase}={value:.2f}s" for phase, value in best['phases'].items())
+            print(f"total={total:4} fanout={fanout:2}  rows={best['rows']:4}  {best['seconds']:6.2f}s  "
+                  f"{best['listings_per_second']:6.2f} listings/s  browsers={best['browser_peak_mb']:.0f}MB  "
+                  f"python={best['python_peak_mb']:.0f}MB  {phases}")
+
+    close_pool()
+    server.shutdown()
+    print(f"Fixture requests: {state.requests}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+    if args.shared_names:
+        short = [run for run in results if run['rows'] < min(run['total'], args.feed_length)]
+        if short:
+            print(f"FAIL: {len(short)} run(s) dropped listings that share a name")
+            sys.exit(1)
+
+    if args.min_rate is not None:
+        slow = [run for run in results if run['listings_per_second'] < args.min_rate]
+        if slow:
+            print(f"FAIL: {len(slow)} run(s) below {args.min_rate} listings/s")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Startup benchmark for the web app, with and without the boot-time scraper warm-up.
+
+Every run is a fresh interpreter that imports main.py and reports:
+
+- import: time to import main.py (pandas and Playwright stay unloaded unless warming up)
+- first_request: time until the first request (GET /) has been served
+- first_listing: with --first-scrape, time from the first streamed scrape to its first
+  listing, after --idle seconds (a freshly started container waiting for traffic)
+
+The scrape runs against the offline Maps fixture (benchmarks/maps_fixture.py), so it needs
+Playwright's Chromium but no network. The median of --repeat runs is reported.
+
+    python benchmarks/bench_startup.py --repeat 5 --first-scrape --idle 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import maps_fixture  # noqa: E402
+
+CHILD = r"""
+import json, os, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.app.test_client().get('/')
+served = time.perf_counter()
+result = {
+    'import': imported - started,
+    'first_request': served - started,
+    'loaded': sorted(name for name in ('pandas', 'playwright', 'requests') if name in sys.modules),
+}
+if os.environ['BENCH_FIRST_SCRAPE'] == '1':
+    time.sleep(float(os.environ['BENCH_IDLE']))
+    from scraper import stream_scrape
+    scrape_started = time.perf_counter()
+    next(stream_scrape(os.environ['BENCH_TERM'], total=1))
+    result['first_listing'] = time.perf_counter() - scrape_started
+print('BENCH ' + json.dumps(result), flush=True)
+# Skip interpreter shutdown, which would wait for the scraper threads and browsers
+os._exit(0)
+"""
+
+
+def run_once(env):
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    for line in proc.stdout.splitlines():
+        if line.startswith('BENCH '):
+            result = json.loads(line[len('BENCH '):])
+            result['process'] = wall
+            return result
+    raise RuntimeError(f"Startup run failed (exit {proc.returncode}):\n{proc.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--first-scrape', action='store_true', help="also time the first streamed scrape")
+    parser.add_argument('--idle', type=float, default=3.0, help="seconds between boot and the first scrape")
+    parser.add_argument('--latency', type=float, default=0.0, help="fixture seconds per response")
+    parser.add_argument('--term', default="pizza in lahore")
+    parser.add_argument('--json', help="write the results to this file")
+    args = parser.parse_args()
+
+    server, _, url = maps_fixture.start(latency=args.latency)
+    results = {}
+    for mode, warmup in (('lazy', '0'), ('warmup', '1')):
+        env = dict(os.environ, MAPS_BASE_URL=url, SCRAPER_WARMUP=warmup, BENCH_TERM=args.term,
+                   BENCH_IDLE=str(args.idle), BENCH_FIRST_SCRAPE='1' if args.first_scrape else '0')
+        runs = [run_once(env) for _ in range(args.repeat)]
+        summary = {
+            key: round(statistics.median(run[key] for run in runs), 3)
+            for key in ('import', 'first_request', 'process', 'first_listing') if key in runs[0]
+        }
+        summary['loaded'] = runs[0]['loaded']
+        results[mode] = summary
+        timings = '  '.join(f"{key}={value:.3f}s" for key, value in summary.items() if key != 'loaded')
+        print(f"{mode:7} {timings}  loaded at boot: {', '.join(summary['loaded']) or 'none'}")
+
+    server.shutdown()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
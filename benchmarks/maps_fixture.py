@@ -0,0 +1,252 @@
+"""Offline stand-in for Google Maps search, serving the DOM the scraper's selectors target.
+
+Serves a search page (#searchboxinput), a scrollable results feed (div[role="feed"] with
+/maps/place/ links in result cards showing rating and review count, more loaded on scroll,
+span.HlvSq at the end) and place panels laid out
+for extractors.SELECTORS. Places are generated deterministically from the search term;
+with --shared-names adjacent places share a name, like branches of a chain.
+Point the scraper at it with MAPS_BASE_URL=http://127.0.0.1:8098/maps.
+
+    python benchmarks/maps_fixture.py --port 8098 --feed-length 120 --latency 0.05
+"""
+import argparse
+import hashlib
+import html
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote_plus, unquote_plus, urlparse
+
+SERVICES = [
+    "In-store shopping · In-store pickup · Delivery",
+    "Dine-in · Takeaway · No-contact delivery",
+    "In-store shopping",
+    "Dine-in",
+]
+HOURS = ["Open ⋅ Closes 11 PM", "Closed ⋅ Opens 9 AM Mon", "Open 24 hours"]
+TYPES = ["Restaurant", "Pizza restaurant", "Cafe", "Bakery"]
+
+SEARCH_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Maps fixture</title>
+<style>
+  body { margin: 0; font-family: sans-serif; display: flex; }
+  #side { width: 420px; }
+  div[role="feed"] { height: 600px; overflow-y: auto; }
+  .Nv2PK { height: 96px; border-bottom: 1px solid #ddd; }
+  #panel { flex: 1; padding: 16px; }
+</style></head>
+<body>
+<div id="side">
+  <input id="searchboxinput" type="text" value="__QUERY__">
+  <div id="results"></div>
+</div>
+<div id="panel"></div>
+<script>
+let query = null, offset = 0, loading = false, ended = false, feed = null;
+
+function load() {
+  if (loading || ended) return;
+  loading = true;
+  fetch('__BASE__/api/feed?q=' + encodeURIComponent(query) + '&offset=' + offset)
+    .then(r => r.json())
+    .then(data => {
+      for (const item of data.items) {
+        const row = document.createElement('div');
+        row.className = 'Nv2PK';
+        const link = document.createElement('a');
+        link.href = item.href;
+        link.setAttribute('aria-label', item.name);
+        link.textContent = item.name;
+        link.addEventListener('click', open);
+        row.appendChild(link);
+        // The card header a refresh compares with the stored place (see freshness.py)
+        const rating = document.createElement('span');
+        rating.className = 'MW4etd';
+        rating.textContent = item.rating;
+        const reviews = document.createElement('span');
+        reviews.className = 'UY7F9';
+        reviews.textContent = '(' + item.reviews + ')';
+        row.append(rating, reviews);
+        feed.appendChild(row);
+      }
+      offset += data.items.length;
+      if (data.end) {
+        ended = true;
+        const end = document.createElement('span');
+        end.className = 'HlvSq';
+        end.textContent = "You've reached the end of the list.";
+        feed.appendChild(end);
+      }
+      loading = false;
+    });
+}
+
+function search(term) {
+  query = term; offset = 0; ended = false;
+  document.getElementById('results').innerHTML = '<div role="feed"></div>';
+  feed = document.querySelector('div[role="feed"]');
+  feed.addEventListener('scroll', () => {
+    if (feed.scrollTop + feed.clientHeight >= feed.scrollHeight - 10) load();
+  });
+  load();
+}
+
+function open(event) {
+  // Clicking a result swaps the side panel like Maps does, without leaving the page
+  event.preventDefault();
+  const panel = document.getElementById('panel');
+  panel.innerHTML = '';
+  fetch(this.getAttribute('href') + '?fragment=1').then(r => r.text()).then(text => { panel.innerHTML = text; });
+}
+
+document.getElementById('searchboxinput').addEventListener('keydown', event => {
+  if (event.key === 'Enter') search(event.target.value);
+});
+if (__AUTOSEARCH__) search(document.getElementById('searchboxinput').value);
+</script>
+</body></html>
+"""
+
+PLACE_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{name}</title></head>
+<body>{panel}</body></html>
+"""
+
+PANEL = """<div class="TIHn2 "><h1 class="DUwDvf lfPIob">{name}</h1>
+  <div class="fontBodyMedium dmRWX"><div><span aria-hidden="true">{rating}</span>
+    <span><span><span aria-label="{reviews} reviews">({reviews})</span></span></span></div></div>
+</div>
+<div class="LBgpqf"><button class="DkEaL ">{type}</button></div>
+<div class="WeS02d fontBodyMedium"><div class="PYvSYb ">{introduction}</div></div>
+<div class="LTs0Rc">{services}</div>
+<button data-item-id="address"><div class="fontBodyMedium">{address}</div></button>
+<button data-item-id="oh"><div class="fontBodyMedium">{hours}</div></button>
+<a data-item-id="authority" href="https://{website}"><div class="fontBodyMedium">{website}</div></a>
+<button data-item-id="phone:tel:{tel}"><div class="fontBodyMedium">{phone}</div></button>
+"""
+
+
+class FixtureState:
+    def __init__(self, latency=0.05, feed_length=120, page_size=20, center=(31.52, 74.35), shared_names=False):
+        self.latency = latency
+        self.shared_names = shared_names
+        self.feed_length = feed_length
+        self.page_size = page_size
+        self.center = center
+        self.requests = {'page': 0, 'feed': 0, 'place': 0}
+        self.lock = threading.Lock()
+
+    def count(self, kind):
+        with self.lock:
+            self.requests[kind] += 1
+
+
+def make_place(query, index, center, shared_names=False):
+    """Deterministic place `index` of the results for `query`."""
+    query = ' '.join(query.lower().split())
+    digest = hashlib.sha1(f"{query}|{index}".encode()).hexdigest()
+    number = int(digest[:8], 16)
+    lat = center[0] + (int(digest[8:12], 16) / 0xffff - 0.5) * 0.2
+    lng = center[1] + (int(digest[12:16], 16) / 0xffff - 0.5) * 0.2
+    # The URL always names the place by its index; only the displayed name is shared
+    slug = f"{query.title()} {index + 1}"
+    name = f"{query.title()} {index // 2 + 1}" if shared_names else slug
+    local = f"{number % 100000000:08d}"
+    return {
+        'name': name,
+        'href': (f"/maps/place/{quote_plus(slug)}/data=!4m7!3m6!1s0x{digest[:16]}:0x{digest[16:32]}"
+                 f"!8m2!3d{lat:.7f}!4d{lng:.7f}!16s%2Fg%2F{digest[32:40]}!19sChIJ{digest[:23]}"),
+        'rating': f"{3 + number % 21 / 10:.1f}",
+        'reviews': f"{number % 5000:,}",
+        'type': TYPES[number % len(TYPES)],
+        'introduction': f"Fixture listing {index + 1} for {query}.",
+        'services': SERVICES[number % len(SERVICES)],
+        'address': f"{number % 300 + 1} Fixture Road, Lahore",
+        'hours': HOURS[number % len(HOURS)],
+        'website': f"place{index + 1}.example.com",
+        'phone': f"+92 42 {local[:4]}{local[4:]}",
+        'tel': f"+9242{local}",
+    }
+
+
+def make_handler(state, base):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            path = unquote_plus(url.path)
+            time.sleep(state.latency)
+
+            if url.path.startswith('/maps/api/feed'):
+                state.count('feed')
+                params = parse_qs(url.query)
+                query = params.get('q', [''])[0]
+                offset = int(params.get('offset', ['0'])[0])
+                stop = min(offset + state.page_size, state.feed_length)
+                items = [make_place(query, index, state.center, state.shared_names) for index in range(offset, stop)]
+                self._reply(200, json.dumps({'items': items, 'end': stop >= state.feed_length}), 'application/json')
+            elif url.path.startswith('/maps/place/'):
+                state.count('place')
+                # /maps/place/<name>/data=... ; the index is the trailing number of the name
+                name = path.split('/')[3]
+                query, _, number = name.rpartition(' ')
+                place = make_place(query, int(number) - 1, state.center, state.shared_names)
+                panel = PANEL.format(**{key: html.escape(value) for key, value in place.items()})
+                body = panel if 'fragment' in url.query else PLACE_PAGE.format(name=html.escape(place['name']),
+                                                                                  panel=panel)
+                self._reply(200, body, 'text/html; charset=utf-8')
+            elif url.path.rstrip('/') == '/maps' or url.path.startswith('/maps/search/'):
+                state.count('page')
+                # /maps/search/<query>[/@lat,lng,zoomz] starts with the feed of <query>
+                query = path.split('/')[3] if url.path.startswith('/maps/search/') else ''
+                page = (SEARCH_PAGE.replace('__BASE__', base)
+                        .replace('__QUERY__', html.escape(query))
+                        .replace('__AUTOSEARCH__', 'true' if query else 'false'))
+                self._reply(200, page, 'text/html; charset=utf-8')
+            else:
+                self._reply(404, 'Not found', 'text/plain')
+
+        def _reply(self, status, body, content_type):
+            data = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start(port=0, **options):
+    """Run the fixture on a background thread; returns (server, state, maps_base_url)."""
+    state = FixtureState(**options)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state, '/maps'))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_port}/maps"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8098)
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument('--feed-length', type=int, default=120, help="places in every search feed")
+    parser.add_argument('--page-size', type=int, default=20, help="places loaded per feed scroll")
+    parser.add_argument('--shared-names', action='store_true', help="give adjacent places the same name")
+    args = parser.parse_args()
+
+    server, _, url = start(args.port, latency=args.latency, feed_length=args.feed_length, page_size=args.page_size,
+                           shared_names=args.shared_names)
+    print(f"Maps fixture listening; set MAPS_BASE_URL={url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
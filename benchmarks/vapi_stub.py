@@ -0,0 +1,90 @@
+"""Local stand-in for the VAPI POST /call endpoint.
+
+Answers 201 with a call id after `--latency` seconds, and fails a share of requests with
+429 (with Retry-After) or 503 so retries can be exercised. Point the app at it with
+VAPI_BASE_URL=http://127.0.0.1:8099.
+
+    python benchmarks/vapi_stub.py --port 8099 --rate-limited 0.1 --errors 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubState:
+    def __init__(self, latency=0.05, rate_limited=0.0, errors=0.0, retry_after=1):
+        self.latency = latency
+        self.rate_limited = rate_limited
+        self.errors = errors
+        self.retry_after = retry_after
+        self.counts = {'201': 0, '429': 0, '503': 0}
+        self.numbers = []
+        self.lock = threading.Lock()
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Keep-alive, so connection reuse shows up
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            time.sleep(state.latency)
+
+            roll = random.random()
+            if roll < state.rate_limited:
+                self._reply(429, {'message': 'Too Many Requests'}, {'Retry-After': str(state.retry_after)})
+            elif roll < state.rate_limited + state.errors:
+                self._reply(503, {'message': 'Service Unavailable'})
+            else:
+                with state.lock:
+                    state.numbers.append(body.get('customer', {}).get('number'))
+                self._reply(201, {'id': str(uuid.uuid4()), 'status': 'queued'})
+
+        def _reply(self, status, payload, headers=None):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+            with state.lock:
+                state.counts[str(status)] += 1
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start(port=0, **options):
+    """Run the stub on a background thread; returns (server, state). Port 0 picks a free port."""
+    state = StubState(**options)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds per request")
+    parser.add_argument('--rate-limited', type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument('--errors', type=float, default=0.0, help="share of requests answered with 503")
+    args = parser.parse_args()
+
+    server, _ = start(args.port, latency=args.latency, rate_limited=args.rate_limited, errors=args.errors)
+    print(f"VAPI stub listening on http://127.0.0.1:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from playwright.sync_api import sync_playwright
+
+from metrics import SCRAPER_PHASE_SECONDS, Gauge, timed
+from resource_policy import SCRAPER_BLOCK_RESOURCES, default_policy
+
+# Pool configuration (all optional, see README)
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', 1))
+BROWSER_MAX_CONTEXTS = int(os.getenv('BROWSER_MAX_CONTEXTS', 4))
+BROWSER_MAX_USES = int(os.getenv('BROWSER_MAX_USES', 50))
+BROWSER_MAX_RSS_GROWTH_MB = int(os.getenv('BROWSER_MAX_RSS_GROWTH_MB', 512))
+BROWSER_HEADLESS = os.getenv('BROWSER_HEADLESS', '1') != '0'
+
+
+class PoolExhausted(Exception):
+    pass
+
+
+def _process_rss_kb(pid):
+    # Resident memory of a single process, read from /proc (Linux only)
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+class PooledBrowser:
+    def __init__(self, playwright):
+        with timed(SCRAPER_PHASE_SECONDS, phase='launch'):
+            self.browser = playwright.chromium.launch(headless=BROWSER_HEADLESS)
+        self.created_at = time.time()
+        self.uses = 0
+        self.active_contexts = 0
+        self.baseline_rss_mb = self.rss_mb()
+
+    def is_healthy(self):
+        return self.browser.is_connected()
+
+    def rss_mb(self):
+        # Chromium is multi-process: sum the browser, GPU and renderer processes
+        try:
+            cdp = self.browser.new_browser_cdp_session()
+            try:
+                processes = cdp.send('SystemInfo.getProcessInfo').get('processInfo', [])
+            finally:
+                cdp.detach()
+        except Exception:
+            return None
+        return sum(_process_rss_kb(proc['id']) for proc in processes) / 1024
+
+    def needs_recycle(self):
+        if self.uses >= BROWSER_MAX_USES:
+            return True
+        rss = self.rss_mb()
+        if rss is not None and self.baseline_rss_mb is not None:
+            return rss - self.baseline_rss_mb > BROWSER_MAX_RSS_GROWTH_MB
+        return False
+
+    def close(self):
+        try:
+            self.browser.close()
+        except Exception as e:
+            print(f"Error closing pooled browser: {e}")
+
+
+class BrowserPool:
+    """Warm Chromium browsers handing out isolated contexts.
+
+    Playwright's sync API is bound to the thread that started it, so a pool
+    belongs to one thread; use get_pool() to get the current thread's pool.
+    """
+
+    def __init__(self, size=BROWSER_POOL_SIZE, max_contexts=BROWSER_MAX_CONTEXTS,
+                 resource_policy=default_policy if SCRAPER_BLOCK_RESOURCES else None):
+        self.size = size
+        self.max_contexts = max_contexts
+        self.resource_policy = resource_policy
+        self.owner = threading.get_ident()
+        self.launched = 0
+        self.recycled = 0
+        self._playwright = None
+        self._browsers = []
+        _pools.add(self)
+
+    def _ensure_started(self):
+        if threading.get_ident() != self.owner:
+            raise RuntimeError("BrowserPool used outside of the thread that owns it")
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+
+    def _launch(self):
+        self._ensure_started()
+        pooled = PooledBrowser(self._playwright)
+        self._browsers.append(pooled)
+        self.launched += 1
+        print(f"Info: Browser launched for pool ({len(self._browsers)}/{self.size}).")
+        return pooled
+
+    def _retire(self, pooled):
+        if pooled not in self._browsers:
+            return
+        self._browsers.remove(pooled)
+        pooled.close()
+        self.recycled += 1
+
+    def warm(self):
+        self._ensure_started()
+        while len(self._browsers) < self.size:
+            self._launch()
+
+    def checkout(self):
+        self._ensure_started()
+        for pooled in list(self._browsers):
+            if not pooled.is_healthy():
+                print("Info: Dropping disconnected browser from pool.")
+                self._retire(pooled)
+
+        candidates = [b for b in self._browsers if b.active_contexts < self.max_contexts]
+        if candidates:
+            pooled = min(candidates, key=lambda b: b.active_contexts)
+        elif len(self._browsers) < self.size:
+            pooled = self._launch()
+        else:
+            raise PoolExhausted(f"All {self.size} pooled browsers are at {self.max_contexts} contexts")
+
+        context = pooled.browser.new_context()
+        if self.resource_policy is not None:
+            self.resource_policy.attach(context)
+        pooled.active_contexts += 1
+        return pooled, context
+
+    def checkin(self, pooled, context):
+        try:
+            context.close()
+        except Exception as e:
+            print(f"Error closing browser context: {e}")
+        pooled.active_contexts -= 1
+        pooled.uses += 1
+
+        if pooled.active_contexts == 0 and (not pooled.is_healthy() or pooled.needs_recycle()):
+            print(f"Info: Recycling browser after {pooled.uses} uses.")
+            self._retire(pooled)
+
+    @contextmanager
+    def page(self):
+        pooled, context = self.checkout()
+        try:
+            yield context.new_page()
+        finally:
+            self.checkin(pooled, context)
+
+    def stats(self):
+        return {
+            'browsers': len(self._browsers),
+            'active_contexts': sum(b.active_contexts for b in self._browsers),
+            'launched': self.launched,
+            'recycled': self.recycled,
+        }
+
+    def close(self):
+        for pooled in list(self._browsers):
+            self._retire(pooled)
+        if self._playwright is not None:
+            self._playwright.stop()
+            self._playwright = None
+
+
+class _PoolHolder:
+    # Lives in the owning thread's locals, which Python clears on that same thread when it
+    # exits, so a thread that ends without close_pool() still shuts its browsers and driver down
+
+    __slots__ = ('pool',)
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __del__(self):
+        pool = self.pool
+        if pool is None or threading.get_ident() != pool.owner:
+            return
+        try:
+            pool.close()
+        except Exception as e:
+            print(f"Error closing the browser pool of an exited thread: {e}")
+
+
+_local = threading.local()
+# Every live pool in the process, for the gauges below
+_pools = weakref.WeakSet()
+
+
+def _pool_stat(stat):
+    return lambda: {(): sum(pool.stats()[stat] for pool in list(_pools))}
+
+
+Gauge('browser_pool_browsers', "Browsers open across the process's pools", function=_pool_stat('browsers'))
+Gauge('browser_pool_active_contexts', "Browser contexts checked out", function=_pool_stat('active_contexts'))
+Gauge('browser_pool_launched', "Browsers launched since start", function=_pool_stat('launched'))
+Gauge('browser_pool_recycled', "Browsers retired since start", function=_pool_stat('recycled'))
+
+
+def get_pool():
+    """The current thread's pool, created on first use.
+
+    Meant for long-lived threads (workers, the scraper executors), where it stays warm; a pool
+    is closed when its thread exits, so short-lived threads cost a cold launch each.
+    """
+    holder = getattr(_local, 'holder', None)
+    if holder is None:
+        holder = _PoolHolder(BrowserPool())
+        _local.holder = holder
+    return holder.pool
+
+
+def close_pool():
+    holder = getattr(_local, 'holder', None)
+    if holder is not None:
+        pool, holder.pool = holder.pool, None
+        _local.holder = None
+        pool.close()
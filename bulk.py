@@ -0,0 +1,220 @@
+import csv
+import io
+import os
+import uuid
+
+from psycopg2.extras import Json, RealDictCursor, execute_values
+
+from db import get_db_connection
+from jobs import NOTIFY_CHANNEL
+from metrics import DB_SECONDS, timed
+
+# Largest accepted bulk request and per-term result count
+BULK_MAX_TERMS = int(os.getenv('BULK_MAX_TERMS', 500))
+SCRAPE_MAX_TOTAL = int(os.getenv('SCRAPE_MAX_TOTAL', 200))
+
+# bulk_places records which child job scrapes each place of a bulk job (see claim_place)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bulk_jobs (
+    bulk_id UUID PRIMARY KEY,
+    username VARCHAR(100),
+    term_count INTEGER NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS bulk_places (
+    bulk_id UUID NOT NULL,
+    place_id TEXT NOT NULL,
+    job_id UUID NOT NULL,
+    claimed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (bulk_id, place_id)
+);
+-- Set once the claiming job has the place in its results; unfinished claims can be taken over
+ALTER TABLE bulk_places ADD COLUMN IF NOT EXISTS finished BOOLEAN NOT NULL DEFAULT false;
+"""
+
+
+def ensure_schema(conn):
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA)
+    conn.commit()
+
+
+def parse_total(value, default=10, maximum=SCRAPE_MAX_TOTAL):
+    """Validate a per-search result count; raises ValueError for anything outside 1..maximum."""
+    if value in (None, ""):
+        return default
+    error = ValueError(f"total must be a whole number between 1 and {maximum}")
+    # int() would turn JSON true into 1 and 4.7 into 4
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise error
+    try:
+        total = int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise error
+    if not 1 <= total <= maximum:
+        raise ValueError(f"total must be between 1 and {maximum}")
+    return total
+
+
+def parse_searches(items, default_total=10, maximum=SCRAPE_MAX_TOTAL):
+    """Normalize a list of search terms or {'search_term', 'total'} objects into (term, total) pairs.
+
+    Blank terms are dropped and repeated terms (ignoring case and spacing) are kept once.
+    """
+    if not isinstance(items, (list, tuple)):
+        raise ValueError("searches must be a list of search terms")
+    searches = {}
+    for item in items:
+        if isinstance(item, dict):
+            term, total = item.get('search_term') or item.get('term'), item.get('total')
+        else:
+            term, total = item, None
+        term = ' '.join(str(term or "").split())
+        if not term:
+            continue
+        searches.setdefault(term.lower(), (term, parse_total(total, default_total, maximum)))
+
+    if not searches:
+        raise ValueError("No search terms given")
+    if len(searches) > BULK_MAX_TERMS:
+        raise ValueError(f"At most {BULK_MAX_TERMS} search terms per bulk job")
+    return list(searches.values())
+
+
+def parse_search_file(text, default_total=10, maximum=SCRAPE_MAX_TOTAL):
+    """Read searches from an uploaded file: one term per line, optionally followed by `,total`."""
+    items = []
+    for row in csv.reader(io.StringIO(text)):
+        if not row or not row[0].strip():
+            continue
+        if row[0].strip().lower() in ('term', 'search_term', 'keyword'):
+            continue  # Header row
+        items.append({'search_term': row[0], 'total': row[1].strip() if len(row) > 1 else None})
+    return parse_searches(items, default_total, maximum)
+
+
+@timed(DB_SECONDS, operation='enqueue_bulk')
+def enqueue_bulk(username, searches, payload=None):
+    """Queue one child scrape job per (term, total) under a new bulk id; returns the bulk id.
+
+    Child jobs are ordinary scrape_jobs rows, so every worker takes part in a bulk job.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection error")
+    try:
+        bulk_id = str(uuid.uuid4())
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO bulk_jobs (bulk_id, username, term_count) VALUES (%s, %s, %s)",
+                (bulk_id, username, len(searches))
+            )
+            execute_values(
+                cur,
+                "INSERT INTO scrape_jobs (job_id, username, payload, bulk_id) VALUES %s",
+                [
+                    (str(uuid.uuid4()), username,
+                     Json({**(payload or {}), 'search_term': term, 'total': total, 'bulk_id': bulk_id}), bulk_id)
+                    for term, total in searches
+                ]
+            )
+            cur.execute(f"NOTIFY {NOTIFY_CHANNEL}")
+        conn.commit()
+        print(f"Info: Bulk job {bulk_id} queued with {len(searches)} searches.")
+        return bulk_id
+    finally:
+        conn.close()
+
+
+@timed(DB_SECONDS, operation='claim_place')
+def claim_place(conn, bulk_id, job_id, place_id):
+    """Return True if `job_id` should scrape `place_id`, i.e. no other job of the bulk job has claimed it.
+
+    A retried job keeps the places it claimed on an earlier attempt. A claim whose job ended
+    without the place in its results (extraction failed, or the job failed) is taken over.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO bulk_places (bulk_id, place_id, job_id) VALUES (%s, %s, %s)
+            ON CONFLICT (bulk_id, place_id) DO UPDATE SET job_id = EXCLUDED.job_id, claimed_at = now()
+            WHERE bulk_places.job_id = EXCLUDED.job_id
+               OR (NOT bulk_places.finished AND EXISTS (
+                   SELECT 1 FROM scrape_jobs j
+                   WHERE j.job_id = bulk_places.job_id AND j.status IN ('done', 'failed')
+               ))
+            RETURNING place_id
+            """,
+            (bulk_id, place_id, job_id)
+        )
+        claimed = cur.fetchone() is not None
+    conn.commit()
+    return claimed
+
+
+@timed(DB_SECONDS, operation='settle_claims')
+def settle_claims(conn, bulk_id, job_id, place_ids):
+    """Mark the claims of `job_id` whose places are in its results as finished and release the rest.
+
+    Released places (their extraction failed) can be claimed again by the searches still to run.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE bulk_places SET finished = true WHERE bulk_id = %s AND job_id = %s AND place_id = ANY(%s)",
+            (bulk_id, job_id, list(place_ids))
+        )
+        cur.execute("DELETE FROM bulk_places WHERE bulk_id = %s AND job_id = %s AND NOT finished",
+                    (bulk_id, job_id))
+    conn.commit()
+
+
+def get_bulk(bulk_id):
+    """The bulk job and its child jobs (in queue order), or None if there is no such bulk job."""
+    try:
+        uuid.UUID(str(bulk_id))
+    except ValueError:
+        return None
+
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection error")
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT bulk_id, username, term_count, created_at FROM bulk_jobs WHERE bulk_id = %s",
+                        (bulk_id,))
+            bulk = cur.fetchone()
+            if not bulk:
+                return None
+            cur.execute(
+                """
+                SELECT job_id, payload->>'search_term' AS search_term, (payload->>'total')::int AS total,
+                       status, progress, progress_total, result, error
+                FROM scrape_jobs WHERE bulk_id = %s ORDER BY created_at, job_id
+                """,
+                (bulk_id,)
+            )
+            bulk['jobs'] = cur.fetchall()
+            return bulk
+    finally:
+        conn.close()
+
+
+def merge_results(children):
+    """Merge the result rows of finished child jobs by place id, in search order.
+
+    Returns (rows, matches) where `matches` maps each place id to every search term that found it,
+    including searches that left the place to another job.
+    """
+    rows = {}
+    matches = {}
+    for child in children:
+        result = child.get('result') or {}
+        for row in result.get('results') or []:
+            place_id = row.get('Place ID')
+            if place_id is None:
+                continue
+            rows.setdefault(place_id, row)
+            matches.setdefault(place_id, []).append(child['search_term'])
+        for place_id in result.get('shared') or []:
+            matches.setdefault(place_id, []).append(child['search_term'])
+    return list(rows.values()), matches
@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from psycopg2.extras import Json
+
+from db import get_db_connection
+from metrics import DB_SECONDS, timed
+
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', 600))
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', 256))
+SEARCH_CACHE_PERSIST = os.getenv('SEARCH_CACHE_PERSIST', '1') != '0'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_cache (
+    cache_key TEXT PRIMARY KEY,
+    results JSONB NOT NULL,
+    stored_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+
+def cache_key(search_term, total, bounds=None):
+    # "Restaurants  in Lahore" and "restaurants in lahore" are the same search
+    key = f"{' '.join(search_term.lower().split())}|{total}"
+    if bounds:
+        key += "|" + ",".join(f"{float(part):.5f}" for part in bounds)
+    return key
+
+
+def ensure_schema(conn):
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA)
+    conn.commit()
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class ResultCache:
+    """Search results by cache key: an in-memory LRU tier in front of an optional Postgres tier.
+
+    get_or_compute() coalesces concurrent misses for the same key, within the process
+    through an in-flight table and across processes through a Postgres advisory lock.
+    """
+
+    def __init__(self, ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_SIZE, persistent=SEARCH_CACHE_PERSIST):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.persistent = persistent
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _remember(self, key, results, stored_at):
+        with self._lock:
+            self._entries[key] = (stored_at, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @timed(DB_SECONDS, operation='cache_load')
+    def _load(self, key):
+        conn = get_db_connection()
+        if not conn:
+            return None
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT results, EXTRACT(EPOCH FROM stored_at) FROM search_cache
+                    WHERE cache_key = %s AND stored_at > now() - %s * interval '1 second'
+                    """,
+                    (key, self.ttl)
+                )
+                row = cur.fetchone()
+            return (row[0], float(row[1])) if row else None
+        except Exception as e:
+            print(f"Error reading search cache for '{key}': {e}")
+            return None
+        finally:
+            conn.close()
+
+    @timed(DB_SECONDS, operation='cache_store')
+    def _store(self, key, results):
+        conn = get_db_connection()
+        if not conn:
+            return
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO search_cache (cache_key, results, stored_at)
+                    VALUES (%s, %s, now())
+                    ON CONFLICT (cache_key) DO UPDATE SET results = EXCLUDED.results, stored_at = EXCLUDED.stored_at
+                    """,
+                    (key, Json(results))
+                )
+            conn.commit()
+        except Exception as e:
+            print(f"Error writing search cache for '{key}': {e}")
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """Return (results, age_in_seconds) for a fresh entry, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], now - entry[0]
+            if entry:
+                del self._entries[key]
+
+        if self.persistent:
+            loaded = self._load(key)
+            if loaded:
+                results, stored_at = loaded
+                self._remember(key, results, stored_at)
+                self.hits += 1
+                return results, now - stored_at
+
+        self.misses += 1
+        return None
+
+    def put(self, key, results):
+        self._remember(key, results, time.time())
+        if self.persistent:
+            self._store(key, results)
+
+    @contextmanager
+    def _distributed_lock(self, key):
+        # Yields True when another process held the lock, i.e. it may have filled the cache meanwhile
+        conn = get_db_connection() if self.persistent else None
+        if not conn:
+            yield False
+            return
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (key,))
+                waited = not cur.fetchone()[0]
+                if waited:
+                    cur.execute("SELECT pg_advisory_lock(hashtext(%s))", (key,))
+            try:
+                yield waited
+            finally:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (key,))
+        finally:
+            conn.close()
+
+    def get_or_compute(self, key, compute):
+        """Return (results, info) where info carries the cache status and the age of the results.
+
+        compute() is only called on a miss, by one caller per key at a time; a None result is not cached.
+        """
+        cached = self.get(key)
+        if cached:
+            return cached[0], {'status': 'hit', 'age': round(cached[1], 3)}
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.error:
+                raise flight.error
+            return flight.results, {'status': 'coalesced', 'age': 0}
+
+        try:
+            with self._distributed_lock(key) as waited:
+                cached = self.get(key) if waited else None
+                if cached:
+                    flight.results = cached[0]
+                    return cached[0], {'status': 'coalesced', 'age': round(cached[1], 3)}
+
+                results = compute()
+                if results is not None:
+                    self.put(key, results)
+                flight.results = results
+                return results, {'status': 'miss', 'age': 0}
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            flight.event.set()
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+search_cache = ResultCache()
@@ -0,0 +1,85 @@
+import os
+
+from metrics import VAPI_REQUEST_SECONDS, VAPI_RESPONSES, timed
+
+# Base URL of the VAPI API; point it at a local stub for testing
+VAPI_BASE_URL = os.getenv('VAPI_BASE_URL', 'https://api.vapi.ai').rstrip('/')
+# Seconds to wait for VAPI to answer a call request
+VAPI_TIMEOUT = float(os.getenv('VAPI_TIMEOUT', 30))
+
+# Keeps connections to VAPI open between calls; created on first use, like the requests import
+_session = None
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        import requests
+        _session = requests.Session()
+    return _session
+
+
+def build_call_payload(customer_number, message, twilio_config):
+    """Request body for POST /call dialing `customer_number` from the configured Twilio number."""
+    return {
+        "assistantId": os.getenv("VAPI_ASSISTANT_ID"),  # Your Assistant ID
+        "name": os.getenv("VAPI_ASSISTANT_NAME"),  # Your Assistant name
+        "assistant": {
+            "transcriber": {
+                "provider": os.getenv("VAPI_TRANSCRIBER_PROVIDER")  # Transcriber provider
+            },
+            "model": {
+                "provider": os.getenv("VAPI_MODEL_PROVIDER"),  # Model provider
+                "model": os.getenv("VAPI_MODEL_NAME"),  # Your model name
+                "systemPrompt": os.getenv("VAPI_SYSTEM_PROMPT")
+            },
+            "firstMessage": message,
+        },
+        "phoneNumber": {
+            "twilioAccountSid": twilio_config.get('twilioAccountSid'),
+            "twilioAuthToken": twilio_config.get('twilioAuthToken'),
+            "twilioPhoneNumber": twilio_config.get('twilioPhoneNumber'),
+        },
+        "customer": {
+            "number": customer_number  # Customer phone number
+        }
+    }
+
+
+def vapi_headers():
+    return {
+        "Authorization": f"Bearer {os.getenv('VAPI_BEARER_TOKEN')}",  # VAPI Bearer token
+        "Content-Type": "application/json"
+    }
+
+
+def make_call(phone_number, customer_number, message, twilio_config):
+    import requests
+
+    try:
+        # Twilio credentials are passed in by the caller (the job's credentials, originally the session)
+        if not twilio_config:
+            return {"error": "Twilio configuration not found. Please submit the configuration first."}
+
+        customer_number = twilio_config.get('customerPhoneNumber')
+        payload = build_call_payload(customer_number, message, twilio_config)
+
+        # Make the API call to VAPI
+        try:
+            with timed(VAPI_REQUEST_SECONDS, source='single'):
+                response = _get_session().post(f"{VAPI_BASE_URL}/call", json=payload, headers=vapi_headers(),
+                                         timeout=VAPI_TIMEOUT)
+        except requests.exceptions.RequestException:
+            VAPI_RESPONSES.inc(source='single', status='error')
+            raise
+        VAPI_RESPONSES.inc(source='single', status=response.status_code)
+
+        # Check for errors in the response
+        response.raise_for_status()
+
+        # Return response JSON
+        return response.json()
+
+    except requests.exceptions.RequestException as e:
+        print(f"Error making call to {phone_number}: {e}")
+        return {"error": str(e)}
@@ -0,0 +1,357 @@
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from psycopg2.extras import RealDictCursor, execute_values
+
+from calls import VAPI_BASE_URL, VAPI_TIMEOUT, build_call_payload, vapi_headers
+from contacts import contact_index
+from db import get_db_connection
+from metrics import DB_SECONDS, VAPI_REQUEST_SECONDS, VAPI_RESPONSES, timed
+from phones import normalize_phones
+
+# Calls in flight at once
+CAMPAIGN_CONCURRENCY = int(os.getenv('CAMPAIGN_CONCURRENCY', 4))
+# Sustained call requests per second, and how many may go out back to back
+CAMPAIGN_RATE = float(os.getenv('CAMPAIGN_RATE', 1))
+CAMPAIGN_BURST = int(os.getenv('CAMPAIGN_BURST', 5))
+# Attempts per number on 429/5xx responses and connections that could not be opened, with exponential backoff
+CAMPAIGN_MAX_ATTEMPTS = int(os.getenv('CAMPAIGN_MAX_ATTEMPTS', 5))
+CAMPAIGN_BACKOFF = float(os.getenv('CAMPAIGN_BACKOFF', 1))
+CAMPAIGN_BACKOFF_MAX = float(os.getenv('CAMPAIGN_BACKOFF_MAX', 60))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaigns (
+    campaign_id UUID PRIMARY KEY,
+    username VARCHAR(100),
+    source_job_id UUID,
+    message TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS campaign_calls (
+    campaign_id UUID NOT NULL REFERENCES campaigns (campaign_id),
+    phone VARCHAR(32) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    call_id TEXT,
+    http_status INTEGER,
+    error TEXT,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (campaign_id, phone)
+);
+-- Whether numbers already called by another campaign are dialed again
+ALTER TABLE campaigns ADD COLUMN IF NOT EXISTS redial BOOLEAN NOT NULL DEFAULT false;
+"""
+
+
+def ensure_schema(conn):
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA)
+    conn.commit()
+
+
+def clean_numbers(numbers):
+    """Distinct E.164 numbers in their original order; numbers that cannot be normalized are dropped."""
+    normalized = normalize_phones([None if number == "N/A" else number for number in numbers])
+    return list(dict.fromkeys(normalized.dropna()))
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            time.sleep(wait_for)
+
+
+def _retry_after(response):
+    # Retry-After is either a number of seconds or an HTTP date
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _never_sent(error):
+    # requests wraps urllib3's errors, sometimes in a MaxRetryError; only failures to open the
+    # connection prove the request body never left. A reset after the POST is a ConnectionError too.
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    reason = getattr(reason, 'reason', reason)
+    return isinstance(reason, (ConnectTimeoutError, NewConnectionError))
+
+
+class CallDispatcher:
+    """Places VAPI calls over pooled connections, rate limited and retried on 429/5xx.
+
+    Only requests that never reached VAPI (the connection could not be opened) are retried as
+    well. Once the request was sent, a lost response may still mean the call was placed, so it is reported as
+    'unknown' rather than dialed again.
+
+    dial() is safe to call from many threads at once.
+    """
+
+    def __init__(self, base_url=VAPI_BASE_URL, rate=CAMPAIGN_RATE, burst=CAMPAIGN_BURST,
+                 concurrency=CAMPAIGN_CONCURRENCY, max_attempts=CAMPAIGN_MAX_ATTEMPTS):
+        self.url = f"{base_url.rstrip('/')}/call"
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.bucket = TokenBucket(rate, burst)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _backoff(self, attempt, response=None):
+        delay = _retry_after(response) if response is not None else None
+        if delay is None:
+            # Exponential backoff with full jitter
+            delay = random.uniform(0, min(CAMPAIGN_BACKOFF_MAX, CAMPAIGN_BACKOFF * 2 ** (attempt - 1)))
+        time.sleep(min(delay, CAMPAIGN_BACKOFF_MAX))
+
+    def dial(self, number, message, twilio_config):
+        """Call `number`; returns {'status': 'placed'|'failed'|'unknown', 'attempts', 'call_id', 'http_status', 'error'}."""
+        payload = build_call_payload(number, message, twilio_config)
+        outcome = {'status': 'failed', 'attempts': 0, 'call_id': None, 'http_status': None, 'error': None}
+
+        for attempt in range(1, self.max_attempts + 1):
+            self.bucket.acquire()
+            outcome['attempts'] = attempt
+            try:
+                with timed(VAPI_REQUEST_SECONDS, source='campaign'):
+                    response = self.session.post(self.url, json=payload, headers=vapi_headers(), timeout=VAPI_TIMEOUT)
+            except requests.exceptions.ConnectionError as e:
+                VAPI_RESPONSES.inc(source='campaign', status='error')
+                if not _never_sent(e):
+                    # E.g. the connection was reset after the POST: VAPI may have placed the call
+                    outcome['status'] = 'unknown'
+                    outcome['error'] = str(e)
+                    return outcome
+                # The request never got to VAPI, so it is safe to send again
+                outcome['error'] = str(e)
+                if attempt < self.max_attempts:
+                    self._backoff(attempt)
+                continue
+            except requests.exceptions.RequestException as e:
+                # E.g. a read timeout after the request was sent
+                VAPI_RESPONSES.inc(source='campaign', status='error')
+                outcome['status'] = 'unknown'
+                outcome['error'] = str(e)
+                return outcome
+
+            VAPI_RESPONSES.inc(source='campaign', status=response.status_code)
+            outcome['http_status'] = response.status_code
+            if response.ok:
+                try:
+                    outcome['call_id'] = response.json().get('id')
+                except ValueError:
+                    pass
+                outcome['status'] = 'placed'
+                outcome['error'] = None
+                return outcome
+
+            outcome['error'] = response.text[:500]
+            if response.status_code not in RETRY_STATUSES:
+                break
+            if attempt < self.max_attempts:
+                self._backoff(attempt, response)
+
+        return outcome
+
+    def close(self):
+        self.session.close()
+
+
+@timed(DB_SECONDS, operation='create_campaign')
+def create_campaign(username, numbers, message, source_job_id=None, redial=False):
+    """Store a campaign with one pending call per distinct number.
+
+    Unless `redial`, numbers any campaign has already called are left out. When none are left,
+    nothing is stored and the campaign_id is None.
+    Returns (campaign_id, call count, numbers left out).
+    """
+    numbers = clean_numbers(numbers)
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection error")
+    try:
+        campaign_id = str(uuid.uuid4())
+        with conn.cursor() as cur:
+            called = set()
+            if not redial:
+                cur.execute("SELECT phone_e164 FROM contacts WHERE phone_e164 = ANY(%s) AND called_at IS NOT NULL",
+                            (numbers,))
+                called = {row[0] for row in cur.fetchall()}
+                numbers = [number for number in numbers if number not in called]
+            if not numbers:
+                return None, 0, len(called)
+            cur.execute(
+                """
+                INSERT INTO campaigns (campaign_id, username, source_job_id, message, redial)
+                VALUES (%s, %s, %s, %s, %s)
+                """,
+                (campaign_id, username, source_job_id, message, redial)
+            )
+            execute_values(cur, "INSERT INTO campaign_calls (campaign_id, phone) VALUES %s",
+                           [(campaign_id, number) for number in numbers])
+        conn.commit()
+        return campaign_id, len(numbers), len(called)
+    finally:
+        conn.close()
+
+
+@timed(DB_SECONDS, operation='campaign_record')
+def _record(conn, campaign_id, phone, status, outcome=None):
+    outcome = outcome or {}
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE campaign_calls
+            SET status = %s, attempts = attempts + %s, call_id = COALESCE(%s, call_id),
+                http_status = COALESCE(%s, http_status), error = %s, updated_at = now()
+            WHERE campaign_id = %s AND phone = %s
+            """,
+            (status, outcome.get('attempts', 0), outcome.get('call_id'), outcome.get('http_status'),
+             outcome.get('error'), campaign_id, phone)
+        )
+    conn.commit()
+
+
+def run_campaign(conn, campaign_id, twilio_config, progress=None, dispatcher=None):
+    """Dial every pending number of a campaign; returns the call counts by status.
+
+    Statuses are written to campaign_calls as calls finish, on the calling thread. Calls left
+    'dialing' by an interrupted run may have gone out, so they become 'unknown' instead of
+    being dialed again.
+    """
+    own_dispatcher = dispatcher is None
+    dispatcher = dispatcher or CallDispatcher()
+    try:
+        return _run(conn, campaign_id, twilio_config, progress, dispatcher)
+    finally:
+        if own_dispatcher:
+            dispatcher.close()
+
+
+def _run(conn, campaign_id, twilio_config, progress, dispatcher):
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT message, redial FROM campaigns WHERE campaign_id = %s", (campaign_id,))
+        campaign = cur.fetchone()
+        message = campaign['message']
+        cur.execute(
+            "UPDATE campaign_calls SET status = 'unknown', updated_at = now() "
+            "WHERE campaign_id = %s AND status = 'dialing'",
+            (campaign_id,)
+        )
+        cur.execute("SELECT phone FROM campaign_calls WHERE campaign_id = %s AND status = 'pending' ORDER BY phone",
+                    (campaign_id,))
+        numbers = [row['phone'] for row in cur.fetchall()]
+    conn.commit()
+    contact_index.ensure_loaded(conn)
+
+    done = 0
+    pending = {}
+    remaining = iter(numbers)
+    with ThreadPoolExecutor(max_workers=dispatcher.concurrency, thread_name_prefix='campaign') as executor:
+        def submit_next():
+            nonlocal done
+            for number in remaining:
+                # Another campaign may have called the number since this one was created
+                if not contact_index.claim_call(conn, number, campaign_id) and not campaign['redial']:
+                    _record(conn, campaign_id, number, 'skipped')
+                    done += 1
+                    continue
+                _record(conn, campaign_id, number, 'dialing')
+                pending[executor.submit(dispatcher.dial, number, message, twilio_config)] = number
+                return
+
+        # At most `concurrency` numbers are marked as dialing at a time
+        for _ in range(dispatcher.concurrency):
+            submit_next()
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                number = pending.pop(future)
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    outcome = {'status': 'failed', 'error': str(e)}
+                _record(conn, campaign_id, number, outcome['status'], outcome)
+                if outcome['status'] == 'failed':
+                    contact_index.release_call(conn, number, campaign_id)
+                done += 1
+                if progress:
+                    progress(done, len(numbers))
+                submit_next()
+
+    return campaign_counts(conn, campaign_id)
+
+
+def campaign_counts(conn, campaign_id):
+    with conn.cursor() as cur:
+        cur.execute("SELECT status, count(*) FROM campaign_calls WHERE campaign_id = %s GROUP BY status",
+                    (campaign_id,))
+        return dict(cur.fetchall())
+
+
+def get_campaign(campaign_id):
+    """The campaign with its calls and counts by status, or None."""
+    try:
+        uuid.UUID(str(campaign_id))
+    except ValueError:
+        return None
+
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection error")
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT campaign_id, username, source_job_id, created_at FROM campaigns WHERE campaign_id = %s",
+                        (campaign_id,))
+            campaign = cur.fetchone()
+            if not campaign:
+                return None
+            cur.execute(
+                """
+                SELECT phone, status, attempts, call_id, http_status, error, updated_at
+                FROM campaign_calls WHERE campaign_id = %s ORDER BY phone
+                """,
+                (campaign_id,)
+            )
+            campaign['calls'] = cur.fetchall()
+        campaign['counts'] = campaign_counts(conn, campaign_id)
+        return campaign
+    finally:
+        conn.close()
@@ -0,0 +1,136 @@
+import os
+
+from psycopg2.extras import Json, execute_values
+
+from listing import Listing
+from metrics import DB_SECONDS, timed
+
+# Checkpoint writes are batched: one round-trip per this many harvested or finished places
+CHECKPOINT_EVERY = int(os.getenv('CHECKPOINT_EVERY', 10))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_checkpoints (
+    job_id UUID NOT NULL,
+    place_id TEXT NOT NULL,
+    url TEXT,
+    position INTEGER NOT NULL,
+    -- The finished listing (Listing.to_row); NULL while the place is only harvested
+    record JSONB,
+    PRIMARY KEY (job_id, place_id)
+);
+"""
+
+
+def ensure_schema(conn):
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA)
+    conn.commit()
+
+
+class JobCheckpoint:
+    """Harvested places and finished listings of one scrape job, kept until the job completes.
+
+    A retried job loads the checkpoint of its earlier attempts: finished listings are restored
+    without opening their places again, and places that were harvested but not finished are
+    extracted first. Writes are buffered and go out every CHECKPOINT_EVERY places and on flush().
+    Must be used on one thread (the worker's connection is not shared).
+    """
+
+    def __init__(self, conn, job_id):
+        self.conn = conn
+        self.job_id = job_id
+        self._done = {}
+        self._urls = {}
+        self._harvested = []
+        self._finished = []
+
+    @timed(DB_SECONDS, operation='checkpoint_load')
+    def load(self):
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "SELECT place_id, url, record FROM job_checkpoints WHERE job_id = %s ORDER BY position",
+                (self.job_id,)
+            )
+            rows = cur.fetchall()
+        self.conn.commit()
+        for place_id, url, record in rows:
+            self._urls[place_id] = url
+            if record is not None:
+                self._done[place_id] = record
+        if rows:
+            print(f"Info: Job {self.job_id} resumes with {len(self._done)} finished listings "
+                  f"and {len(rows) - len(self._done)} harvested places.")
+
+    def restored(self):
+        """Listings finished by earlier attempts, in the order they were harvested."""
+        return [Listing.from_row(record) for record in self._done.values()]
+
+    def pending(self):
+        """Places harvested by earlier attempts but never finished, as harvest records."""
+        return [
+            {'place_id': place_id, 'url': url, 'index': None}
+            for place_id, url in self._urls.items()
+            if place_id not in self._done and url
+        ]
+
+    def is_done(self, place_id):
+        return place_id in self._done
+
+    def harvested(self, listing):
+        place_id = listing['place_id']
+        if place_id in self._urls:
+            return
+        self._urls[place_id] = listing['url']
+        self._harvested.append((self.job_id, place_id, listing['url'], len(self._urls)))
+        self._maybe_flush()
+
+    def finished(self, listing):
+        if not listing.place_id:
+            return
+        row = listing.to_row()
+        self._done[listing.place_id] = row
+        if listing.place_id not in self._urls:
+            # Restored from a cache entry or a place that was never recorded as harvested
+            self._urls[listing.place_id] = None
+        self._finished.append((self.job_id, listing.place_id, self._urls[listing.place_id], len(self._urls),
+                               Json(row)))
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if len(self._harvested) + len(self._finished) >= CHECKPOINT_EVERY:
+            self.flush()
+
+    @timed(DB_SECONDS, operation='checkpoint_write')
+    def flush(self):
+        if not self._harvested and not self._finished:
+            return
+        with self.conn.cursor() as cur:
+            if self._harvested:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO job_checkpoints (job_id, place_id, url, position) VALUES %s
+                    ON CONFLICT (job_id, place_id) DO NOTHING
+                    """,
+                    self._harvested
+                )
+            if self._finished:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO job_checkpoints (job_id, place_id, url, position, record) VALUES %s
+                    ON CONFLICT (job_id, place_id) DO UPDATE SET record = EXCLUDED.record
+                    """,
+                    self._finished
+                )
+        self.conn.commit()
+        self._harvested = []
+        self._finished = []
+
+    def clear(self):
+        # The job result holds everything once the job is done
+        with self.conn.cursor() as cur:
+            cur.execute("DELETE FROM job_checkpoints WHERE job_id = %s", (self.job_id,))
+        self.conn.commit()
+        self._harvested = []
+        self._finished = []
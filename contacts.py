@@ -0,0 +1,126 @@
+import threading
+
+from psycopg2.extras import execute_values
+
+from metrics import DB_SECONDS, timed
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    phone_e164 VARCHAR(16) PRIMARY KEY,
+    place_id TEXT,
+    first_seen_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    scraped_at TIMESTAMPTZ,
+    called_at TIMESTAMPTZ,
+    campaign_id UUID
+);
+"""
+
+
+def ensure_schema(conn):
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA)
+    conn.commit()
+
+
+class ContactIndex:
+    """Places and phone numbers already scraped or called.
+
+    Postgres (`contacts`, plus the place ids in `places`) is the source of truth; in-memory sets
+    answer membership checks without a query. The sets are loaded once per process and only
+    learn about other processes' work on reload(), so claim_call() always confirms in Postgres.
+    """
+
+    def __init__(self):
+        self._places = set()
+        self._phones = set()
+        self._called = set()
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @timed(DB_SECONDS, operation='contacts_reload')
+    def reload(self, conn):
+        with conn.cursor() as cur:
+            cur.execute("SELECT place_id FROM places")
+            places = {row[0] for row in cur}
+            cur.execute("SELECT phone_e164, called_at IS NOT NULL FROM contacts")
+            rows = cur.fetchall()
+        conn.commit()
+        with self._lock:
+            self._places = places
+            self._phones = {phone for phone, _ in rows}
+            self._called = {phone for phone, called in rows if called}
+            self._loaded = True
+        print(f"Info: Contact index loaded with {len(places)} places and {len(rows)} phone numbers.")
+
+    def ensure_loaded(self, conn):
+        if not self._loaded:
+            self.reload(conn)
+
+    def knows_place(self, place_id):
+        return place_id in self._places
+
+    def knows_phone(self, phone):
+        return phone is not None and phone in self._phones
+
+    def was_called(self, phone):
+        return phone in self._called
+
+    @timed(DB_SECONDS, operation='contacts_record')
+    def record_scraped(self, conn, listings):
+        """Add scraped listings (place ids and E.164 numbers) to the index."""
+        phones = {}
+        for listing in listings:
+            if listing.phone_e164:
+                phones.setdefault(listing.phone_e164, listing.place_id)
+        if phones:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO contacts (phone_e164, place_id, scraped_at) VALUES %s
+                    ON CONFLICT (phone_e164) DO UPDATE
+                    SET scraped_at = now(), place_id = COALESCE(EXCLUDED.place_id, contacts.place_id)
+                    """,
+                    list(phones.items()),
+                    template="(%s, %s, now())"
+                )
+            conn.commit()
+        with self._lock:
+            self._places.update(listing.place_id for listing in listings if listing.place_id)
+            self._phones.update(phones)
+
+    @timed(DB_SECONDS, operation='claim_call')
+    def claim_call(self, conn, phone, campaign_id):
+        """Mark `phone` as called by `campaign_id`; False if it was already called (by anyone)."""
+        if phone in self._called:
+            return False
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO contacts (phone_e164, called_at, campaign_id) VALUES (%s, now(), %s)
+                ON CONFLICT (phone_e164) DO UPDATE SET called_at = now(), campaign_id = EXCLUDED.campaign_id
+                WHERE contacts.called_at IS NULL
+                RETURNING phone_e164
+                """,
+                (phone, campaign_id)
+            )
+            claimed = cur.fetchone() is not None
+        conn.commit()
+        with self._lock:
+            self._phones.add(phone)
+            self._called.add(phone)
+        return claimed
+
+    def release_call(self, conn, phone, campaign_id):
+        # A call that never went through may be dialed again later
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE contacts SET called_at = NULL WHERE phone_e164 = %s AND campaign_id = %s",
+                (phone, campaign_id)
+            )
+        conn.commit()
+        with self._lock:
+            self._called.discard(phone)
+
+
+contact_index = ContactIndex()
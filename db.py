@@ -0,0 +1,39 @@
+import os
+import psycopg2
+from dotenv import load_dotenv
+
+# Load environment variables from the .env file
+load_dotenv()
+
+# Database configuration
+DB_HOST = os.getenv('DB_HOST')
+DB_NAME = os.getenv('DB_NAME')
+DB_USER = os.getenv('DB_USER')
+DB_PASSWORD = os.getenv('DB_PASSWORD')
+
+# Construct the database URI
+DATABASE_URI = f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}'
+
+# Function to establish a connection to the database
+def get_db_connection():
+    try:
+        conn = psycopg2.connect(
+            host=DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD
+        )
+        return conn
+    except Exception as e:
+        print("Error connecting to the database:", e)
+        return None
+
+# Pool settings for the SQLAlchemy engine shared by the web app (see users.py)
+ENGINE_OPTIONS = {
+    'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+    'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+    'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    'pool_pre_ping': True,
+    'connect_args': {'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5))},
+}
@@ -0,0 +1,154 @@
+import csv
+import functools
+import gzip
+import importlib.util
+import json
+import os
+
+from listing import COLUMNS, Listing
+
+EXPORT_DIR = os.getenv('EXPORT_DIR', 'exports')
+EXPORT_FORMAT = os.getenv('EXPORT_FORMAT', 'csv')
+# Rows buffered per Parquet row group / Arrow record batch
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
+INT_FIELDS = {'review_count'}
+FLOAT_FIELDS = {'rating'}
+BOOL_FIELDS = {'store_shopping', 'in_store_pickup', 'delivery', 'open_now'}
+
+
+def _open_text(path, append, compress):
+    mode = 'at' if append else 'wt'
+    # Appending to a gzip file adds a new member, which readers concatenate transparently
+    if compress:
+        return gzip.open(path, mode, encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+class CsvExporter:
+    def __init__(self, path, append=False, compress=False):
+        exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self.path = path
+        self.rows = 0
+        self._file = _open_text(path, append, compress)
+        self._writer = csv.DictWriter(self._file, fieldnames=COLUMNS, extrasaction='ignore')
+        if not exists:
+            self._writer.writeheader()
+
+    def write(self, listing):
+        self._writer.writerow(listing.to_row())
+        self.rows += 1
+
+    def close(self):
+        self._file.close()
+
+
+class JsonLinesExporter:
+    def __init__(self, path, append=False, compress=False):
+        self.path = path
+        self.rows = 0
+        self._file = _open_text(path, append, compress)
+
+    def write(self, listing):
+        self._file.write(json.dumps(listing.to_row(), ensure_ascii=False) + '\n')
+        self.rows += 1
+
+    def close(self):
+        self._file.close()
+
+
+class _ArrowExporter:
+    # Buffers listings into record batches with a typed schema (one column per Listing field);
+    # subclasses own the file writer
+
+    def __init__(self, path, append=False):
+        import pyarrow as pa  # Optional dependency, only needed for columnar exports
+
+        if append:
+            raise ValueError(f"{type(self).__name__} cannot append to an existing file")
+        self.pa = pa
+        self.path = path
+        self.rows = 0
+        self.schema = pa.schema([
+            pa.field(field, pa.int64() if field in INT_FIELDS
+                     else pa.float64() if field in FLOAT_FIELDS
+                     else pa.bool_() if field in BOOL_FIELDS
+                     else pa.string())
+            for field in Listing.__slots__
+        ])
+        self._buffer = []
+        self._writer = self._open()
+
+    def write(self, listing):
+        self._buffer.append(listing)
+        self.rows += 1
+        if len(self._buffer) >= EXPORT_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        batch = self.pa.record_batch(
+            [[getattr(listing, field) for listing in self._buffer] for field in Listing.__slots__],
+            schema=self.schema
+        )
+        self._write_batch(batch)
+        self._buffer = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+class ParquetExporter(_ArrowExporter):
+    def _open(self):
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(self.path, self.schema, compression='zstd')
+
+    def _write_batch(self, batch):
+        self._writer.write_batch(batch)
+
+
+class ArrowExporter(_ArrowExporter):
+    def _open(self):
+        return self.pa.ipc.new_file(self.path, self.schema)
+
+    def _write_batch(self, batch):
+        self._writer.write_batch(batch)
+
+
+# format name -> (file extension, factory)
+FORMATS = {
+    'csv': ('csv', lambda path, append: CsvExporter(path, append)),
+    'csv.gz': ('csv.gz', lambda path, append: CsvExporter(path, append, compress=True)),
+    'jsonl': ('jsonl', lambda path, append: JsonLinesExporter(path, append)),
+    'jsonl.gz': ('jsonl.gz', lambda path, append: JsonLinesExporter(path, append, compress=True)),
+    'parquet': ('parquet', lambda path, append: ParquetExporter(path, append)),
+    'arrow': ('arrow', lambda path, append: ArrowExporter(path, append)),
+}
+
+
+# Formats whose writers need pyarrow
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+
+
+@functools.lru_cache(maxsize=1)
+def available_formats():
+    """The export formats this installation can write; the columnar ones need pyarrow."""
+    if importlib.util.find_spec('pyarrow') is not None:
+        return tuple(FORMATS)
+    return tuple(fmt for fmt in FORMATS if fmt not in COLUMNAR_FORMATS)
+
+
+def export_path(job_id, fmt=EXPORT_FORMAT):
+    extension = FORMATS[fmt][0]
+    return os.path.join(EXPORT_DIR, f"{job_id}.{extension}")
+
+
+def open_exporter(job_id, fmt=None, append=False):
+    """Open the per-job export file for `fmt` (default EXPORT_FORMAT); listings are written as they arrive."""
+    fmt = fmt or EXPORT_FORMAT
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {', '.join(FORMATS)}")
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    return FORMATS[fmt][1](export_path(job_id, fmt), append)
@@ -0,0 +1,145 @@
+import os
+import time
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from metrics import SCRAPER_FIELD_MISSING, SCRAPER_FIELD_SECONDS, SCRAPER_PHASE_SECONDS, SCRAPER_TIMEOUTS, observe, timed
+
+# Time one listing may take in total: opening it, waiting for its panel and extracting it (ms)
+SCRAPER_LISTING_BUDGET = int(os.getenv('SCRAPER_LISTING_BUDGET', 8000))
+# The panel counts as loaded once its DOM has not changed for this long (ms)
+SCRAPER_SETTLE_MS = int(os.getenv('SCRAPER_SETTLE_MS', 250))
+
+# Every field read from a place panel, in one declarative table: field -> XPath.
+# The first matching node's innerText is taken; fields with no match are reported as missing.
+SELECTORS = {
+    'name': '//div[@class="TIHn2 "]//h1[@class="DUwDvf lfPIob"]',
+    'address': '//button[@data-item-id="address"]//div[contains(@class, "fontBodyMedium")]',
+    'website': '//a[@data-item-id="authority"]//div[contains(@class, "fontBodyMedium")]',
+    'phone': '//button[contains(@data-item-id, "phone:tel:")]//div[contains(@class, "fontBodyMedium")]',
+    'type': '//div[@class="LBgpqf"]//button[@class="DkEaL "]',
+    'introduction': '//div[@class="WeS02d fontBodyMedium"]//div[@class="PYvSYb "]',
+    'review_count': '//div[@class="TIHn2 "]//div[@class="fontBodyMedium dmRWX"]//div//span//span//span[@aria-label]',
+    'review_average': '//div[@class="TIHn2 "]//div[@class="fontBodyMedium dmRWX"]//div//span[@aria-hidden]',
+    'services': '//div[@class="LTs0Rc"][1]',
+    'opening_hours': '//button[contains(@data-item-id, "oh")]//div[contains(@class, "fontBodyMedium")]',
+}
+
+HEADER_XPATH = SELECTORS['name']
+
+# Tags the header of the panel on screen so the next wait can tell it from the panel a click
+# brings up, and returns the page URL; names are not compared, as chain stores share them
+_MARK_PANEL_JS = """
+(header) => {
+    const node = document.evaluate(
+        header, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+    ).singleNodeValue;
+    if (node !== null) {
+        node.setAttribute('data-panel-seen', '');
+    }
+    return location.href;
+}
+"""
+
+# Resolves once a header node other than the one tagged by _MARK_PANEL_JS is shown (or the URL
+# moved away from `previous`) and the DOM has had no content changes for `settle` ms, or when
+# `budget` ms have passed. Runs as one round-trip whatever the wait.
+_PANEL_SETTLED_JS = """
+async ({header, previous, settle, budget}) => {
+    const started = performance.now();
+    let changed = started;
+    const observer = new MutationObserver(() => { changed = performance.now(); });
+    observer.observe(document.body || document.documentElement, {childList: true, subtree: true, characterData: true});
+    try {
+        while (true) {
+            const node = document.evaluate(
+                header, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+            ).singleNodeValue;
+            const ready = node !== null && (
+                previous === null || !node.hasAttribute('data-panel-seen') || location.href !== previous
+            );
+            const now = performance.now();
+            if (ready && now - changed >= settle) {
+                return {ready: true, settled: true};
+            }
+            if (now - started >= budget) {
+                return {ready: ready, settled: false};
+            }
+            await new Promise(resolve => setTimeout(resolve, Math.min(50, settle)));
+        }
+    } finally {
+        observer.disconnect();
+    }
+}
+"""
+
+# Evaluated inside the page so a whole panel costs a single driver round-trip;
+# also reports how long each selector took (ms)
+_EXTRACT_JS = """
+(selectors) => {
+    const record = {};
+    const timings = {};
+    for (const [field, xpath] of Object.entries(selectors)) {
+        const started = performance.now();
+        const node = document.evaluate(
+            xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+        ).singleNodeValue;
+        record[field] = node ? node.innerText : null;
+        timings[field] = performance.now() - started;
+    }
+    return {fields: record, timings: timings};
+}
+"""
+
+
+class Deadline:
+    """One time budget shared by every wait spent on a listing."""
+
+    __slots__ = ('expires',)
+
+    def __init__(self, budget=SCRAPER_LISTING_BUDGET):
+        self.expires = time.monotonic() + budget / 1000
+
+    def remaining(self):
+        # Playwright reads a timeout of 0 as "no timeout", so never go below 1 ms
+        return max(1, int((self.expires - time.monotonic()) * 1000))
+
+
+def mark_panel(page):
+    """Tag the panel on screen before a click replaces it; returns the marker for wait_for_panel."""
+    return page.evaluate(_MARK_PANEL_JS, HEADER_XPATH)
+
+
+def wait_for_panel(page, deadline, previous=None):
+    """Wait until the place panel is a new one and stops changing.
+
+    `previous` is the marker mark_panel returned before the click that opens the panel; without
+    it any panel counts as new (e.g. after a navigation).
+
+    Returns False when the deadline ran out on a panel that was still changing; it is then
+    extracted as it is. Raises PlaywrightTimeoutError when no header showed up in time.
+    """
+    with timed(SCRAPER_PHASE_SECONDS, phase='panel_wait'):
+        state = page.evaluate(_PANEL_SETTLED_JS, {
+            'header': HEADER_XPATH, 'previous': previous, 'settle': SCRAPER_SETTLE_MS, 'budget': deadline.remaining(),
+        })
+    if not state['ready']:
+        raise PlaywrightTimeoutError("No place panel within the listing budget")
+    if not state['settled']:
+        SCRAPER_TIMEOUTS.inc(phase='settle')
+    return state['settled']
+
+
+def extract_place(page, selectors=SELECTORS):
+    with timed(SCRAPER_PHASE_SECONDS, phase='extract'):
+        result = page.evaluate(_EXTRACT_JS, selectors)
+    fields = result['fields']
+    missing = [field for field, value in fields.items() if value is None]
+    for field, ms in result['timings'].items():
+        observe(SCRAPER_FIELD_SECONDS, ms / 1000, field=field)
+    for field in missing:
+        SCRAPER_FIELD_MISSING.inc(field=field)
+    return {
+        'fields': fields,
+        'missing': missing,
+    }
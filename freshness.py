@@ -0,0 +1,104 @@
+import os
+import re
+
+from psycopg2.extras import RealDictCursor
+
+from listing import header_hash
+from metrics import DB_SECONDS, timed
+from places_store import listing_from_place
+
+# Places checked more recently than this are reused as stored, without any browser work (seconds)
+PLACE_REFRESH_TTL = int(os.getenv('PLACE_REFRESH_TTL', 86400))
+
+_DIGITS = re.compile(r'\D')
+# Counts shown abbreviated ("1.2K") cannot be compared with the exact stored count
+_ABBREVIATED = re.compile(r'\d\s*[KkMm]')
+
+
+def parse_max_age(value):
+    """Validate a refresh TTL in seconds (default PLACE_REFRESH_TTL); raises ValueError."""
+    if value in (None, ""):
+        return PLACE_REFRESH_TTL
+    max_age = int(value)
+    if max_age < 0:
+        raise ValueError("max_age must be 0 or more seconds")
+    return max_age
+
+
+def card_header_hash(header):
+    """header_hash of a feed card's raw header text, or None when it cannot be read exactly."""
+    if not header or not header.get('name'):
+        return None
+    rating = (header.get('rating') or '').strip().replace(',', '.')
+    reviews = (header.get('reviews') or '').strip()
+    try:
+        rating = float(rating) if rating else None
+    except ValueError:
+        return None
+    if _ABBREVIATED.search(reviews):
+        return None
+    digits = _DIGITS.sub('', reviews)
+    return header_hash(header['name'], rating, int(digits) if digits else None)
+
+
+class PlaceFreshness:
+    """Decides, per harvested place, whether a refresh needs to open it.
+
+    A place checked within `ttl` seconds is reused as stored. An older place whose feed card
+    shows the same header (name, rating, review count) as when it was stored is reused too and
+    marked as checked; anything else needs a full detail extraction.
+    Uses the worker's connection, so it must be used on one thread.
+    """
+
+    def __init__(self, conn, ttl=PLACE_REFRESH_TTL):
+        self.conn = conn
+        self.ttl = ttl
+        self.counts = {'fresh': 0, 'unchanged': 0, 'extracted': 0, 'changed': 0}
+        self._checked = []
+        # Stored content hashes of the places sent to extraction
+        self._content = {}
+
+    @timed(DB_SECONDS, operation='place_freshness')
+    def _lookup(self, place_id):
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT *, EXTRACT(EPOCH FROM now() - COALESCE(last_checked_at, last_scraped_at)) AS age
+                FROM places WHERE place_id = %s
+                """,
+                (place_id,)
+            )
+            row = cur.fetchone()
+        self.conn.commit()
+        return row
+
+    def reuse(self, place):
+        """The stored Listing when `place` needs no detail visit, else None."""
+        row = self._lookup(place['place_id'])
+        if row is not None:
+            self._content[place['place_id']] = row['content_hash']
+            if row['age'] < self.ttl:
+                self.counts['fresh'] += 1
+                return listing_from_place(row)
+            current = card_header_hash(place.get('header'))
+            if current is not None and current == row['header_hash']:
+                self.counts['unchanged'] += 1
+                self._checked.append(place['place_id'])
+                return listing_from_place(row)
+        self.counts['extracted'] += 1
+        return None
+
+    def extracted(self, listing):
+        # New places and places whose content hash differs from the stored one count as changed
+        if self._content.get(listing.place_id) != listing.content_hash():
+            self.counts['changed'] += 1
+
+    @timed(DB_SECONDS, operation='mark_checked')
+    def mark_checked(self):
+        """Record that the places reused on an unchanged header were checked now."""
+        if not self._checked:
+            return
+        with self.conn.cursor() as cur:
+            cur.execute("UPDATE places SET last_checked_at = now() WHERE place_id = ANY(%s)", (self._checked,))
+        self.conn.commit()
+        self._checked = []
@@ -0,0 +1,122 @@
+import os
+import re
+from urllib.parse import unquote, urlparse
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from metrics import SCRAPER_PHASE_SECONDS, SCRAPER_TIMEOUTS, timed
+
+# How long to wait for the feed to grow after a scroll before treating it as exhausted (ms)
+SCRAPER_FEED_IDLE_TIMEOUT = int(os.getenv('SCRAPER_FEED_IDLE_TIMEOUT', 10000))
+
+PLACE_LINK_SELECTOR = 'a[href*="/maps/place/"]'
+
+# The result card around a feed link, and the rating and review count it shows
+FEED_CARD_SELECTORS = {
+    'card': 'div.Nv2PK',
+    'rating': 'span.MW4etd',
+    'reviews': 'span.UY7F9',
+}
+
+# Takes every place link not seen before, stamps it with a harvest index and scrolls the feed,
+# all in one round-trip. Stamped links are skipped by later calls. Each link comes with the
+# header its card shows (name, rating, review count), for refreshes that compare it (see freshness.py).
+_HARVEST_JS = """
+({selector, card}) => {
+    const items = [];
+    let next = window.__harvestNext || 0;
+    const text = (root, css) => {
+        const node = root && root.querySelector(css);
+        return node ? node.innerText : null;
+    };
+    for (const link of document.querySelectorAll(selector + ':not([data-harvest-index])')) {
+        link.dataset.harvestIndex = next;
+        const container = link.closest(card.card);
+        items.push({
+            index: next,
+            url: link.href,
+            header: {name: link.getAttribute('aria-label'), rating: text(container, card.rating),
+                     reviews: text(container, card.reviews)},
+        });
+        next++;
+    }
+    window.__harvestNext = next;
+
+    const feed = document.querySelector('div[role="feed"]');
+    if (feed) {
+        feed.scrollTop = feed.scrollHeight;
+    } else {
+        window.scrollTo(0, document.body.scrollHeight);
+    }
+    return {items: items, ended: document.querySelector('span.HlvSq') !== null};
+}
+"""
+
+# Resolves in the page as soon as new links are appended or the end-of-list marker shows up
+_FEED_CHANGED_JS = """
+(selector) => document.querySelector(selector + ':not([data-harvest-index])') !== null
+    || document.querySelector('span.HlvSq') !== null
+"""
+
+_PLACE_ID_PATTERNS = [
+    re.compile(r'!19s(ChIJ[\w-]+)'),             # Google Place ID
+    re.compile(r'!1s(0x[0-9a-f]+:0x[0-9a-f]+)'),  # Maps feature id
+]
+
+
+def place_id_from_url(url):
+    for pattern in _PLACE_ID_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return match.group(1)
+    # Fall back to the place path, which is stable for a given listing
+    return unquote(urlparse(url).path.rstrip('/'))
+
+
+_COORDS_PATTERN = re.compile(r'!3d(-?\d+(?:\.\d+)?)!4d(-?\d+(?:\.\d+)?)')
+
+
+def coords_from_url(url):
+    """(lat, lng) of the place a link points to, or None when the link carries no coordinates."""
+    match = _COORDS_PATTERN.search(url)
+    return (float(match.group(1)), float(match.group(2))) if match else None
+
+
+def iter_listings(page, total):
+    """Scroll the results feed until `total` distinct places are found or the feed ends.
+
+    Yields {'place_id', 'url', 'index', 'header'} in feed order as soon as each place is found,
+    deduplicated by place id. `index` is the harvest index stamped on the link, usable as
+    a[data-harvest-index="..."]; `header` is the raw text of the result card's name, rating
+    and review count. The generator must be consumed on the page's thread.
+    """
+    count = 0
+    seen = set()
+
+    while count < total:
+        with timed(SCRAPER_PHASE_SECONDS, phase='scroll'):
+            batch = page.evaluate(_HARVEST_JS, {'selector': PLACE_LINK_SELECTOR, 'card': FEED_CARD_SELECTORS})
+        for item in batch['items']:
+            place_id = place_id_from_url(item['url'])
+            if place_id in seen:
+                continue
+            seen.add(place_id)
+            count += 1
+            yield {'place_id': place_id, 'url': item['url'], 'index': item['index'], 'header': item['header']}
+            if count >= total:
+                break
+
+        if count >= total:
+            print(f"Info: Retrieved {count} listings.")
+            break
+        if batch['ended']:
+            print(f"Info: Reached the end of the list. Retrieved {count} listings.")
+            break
+
+        try:
+            with timed(SCRAPER_PHASE_SECONDS, phase='feed_wait'):
+                page.wait_for_function(_FEED_CHANGED_JS, arg=PLACE_LINK_SELECTOR, timeout=SCRAPER_FEED_IDLE_TIMEOUT)
+        except PlaywrightTimeoutError:
+            SCRAPER_TIMEOUTS.inc(phase='feed_wait')
+            print(f"Info: No more listings found. Retrieved {count} listings.")
+            break
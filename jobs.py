@@ -0,0 +1,276 @@
+import os
+import select
+import threading
+import uuid
+
+from psycopg2.extras import Json, RealDictCursor
+
+from db import get_db_connection
+from metrics import DB_SECONDS, timed
+
+# Seconds without a heartbeat before a running job is considered abandoned
+JOB_STALE_AFTER = int(os.getenv('JOB_STALE_AFTER', 300))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+# Seconds between heartbeats of a running job, sent whether or not it makes progress
+JOB_HEARTBEAT_INTERVAL = float(os.getenv('JOB_HEARTBEAT_INTERVAL', 30))
+
+NOTIFY_CHANNEL = 'scrape_jobs'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scrape_jobs (
+    job_id UUID PRIMARY KEY,
+    username VARCHAR(100),
+    payload JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    progress INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker VARCHAR(100),
+    result JSONB,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    started_at TIMESTAMPTZ,
+    heartbeat_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS scrape_jobs_pending_idx ON scrape_jobs (created_at) WHERE status IN ('queued', 'running');
+-- Child jobs of a bulk job (see bulk.py)
+ALTER TABLE scrape_jobs ADD COLUMN IF NOT EXISTS bulk_id UUID;
+CREATE INDEX IF NOT EXISTS scrape_jobs_bulk_idx ON scrape_jobs (bulk_id) WHERE bulk_id IS NOT NULL;
+-- Credentials a job needs (e.g. the Twilio config of its calls), kept out of the payload and
+-- deleted as soon as the job is finished
+CREATE TABLE IF NOT EXISTS job_credentials (
+    job_id UUID PRIMARY KEY,
+    credentials JSONB NOT NULL
+);
+-- Payloads of jobs queued before job_credentials existed carried the Twilio config
+UPDATE scrape_jobs SET payload = payload - 'twilio_config'
+WHERE payload ? 'twilio_config' AND status IN ('done', 'failed');
+"""
+
+# Deletes the credentials of every finished job
+_DROP_FINISHED_CREDENTIALS = """
+DELETE FROM job_credentials c USING scrape_jobs j
+WHERE c.job_id = j.job_id AND j.status IN ('done', 'failed')
+"""
+
+
+def ensure_schema(conn):
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA)
+    conn.commit()
+
+
+@timed(DB_SECONDS, operation='enqueue_job')
+def enqueue_job(username, payload, credentials=None):
+    """Queue a job; `credentials` are stored apart from the payload and only until the job is finished."""
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection error")
+    try:
+        job_id = str(uuid.uuid4())
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO scrape_jobs (job_id, username, payload)
+                VALUES (%s, %s, %s)
+                """,
+                (job_id, username, Json(payload))
+            )
+            if credentials:
+                cur.execute("INSERT INTO job_credentials (job_id, credentials) VALUES (%s, %s)",
+                            (job_id, Json(credentials)))
+            # Wake up idle workers instead of waiting for their next poll
+            cur.execute(f"NOTIFY {NOTIFY_CHANNEL}")
+        conn.commit()
+        print(f"Info: Job {job_id} queued for '{payload.get('search_term')}'.")
+        return job_id
+    finally:
+        conn.close()
+
+
+def get_job(job_id):
+    try:
+        uuid.UUID(str(job_id))
+    except ValueError:
+        return None
+
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection error")
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT job_id, username, status, progress, progress_total, attempts,
+                       result, error, created_at, started_at, finished_at
+                FROM scrape_jobs WHERE job_id = %s
+                """,
+                (job_id,)
+            )
+            return cur.fetchone()
+    finally:
+        conn.close()
+
+
+@timed(DB_SECONDS, operation='claim_job')
+def claim_job(conn, worker_id):
+    # SKIP LOCKED lets any number of workers poll the same table without blocking each other
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            """
+            UPDATE scrape_jobs
+            SET status = 'failed', error = 'Worker lost too many times', finished_at = now()
+            WHERE status = 'running'
+              AND heartbeat_at < now() - %s * interval '1 second'
+              AND attempts >= %s
+            """,
+            (JOB_STALE_AFTER, JOB_MAX_ATTEMPTS)
+        )
+        if cur.rowcount:
+            cur.execute(_DROP_FINISHED_CREDENTIALS)
+        cur.execute(
+            """
+            UPDATE scrape_jobs
+            SET status = 'running', worker = %s, attempts = attempts + 1,
+                started_at = now(), heartbeat_at = now(), error = NULL
+            WHERE job_id = (
+                SELECT job_id FROM scrape_jobs
+                WHERE status = 'queued'
+                   OR (status = 'running' AND heartbeat_at < now() - %s * interval '1 second')
+                -- Single searches go ahead of queued bulk searches so they are not stuck behind them
+                ORDER BY bulk_id IS NOT NULL, created_at
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING job_id, username, payload, attempts, bulk_id
+            """,
+            (worker_id, JOB_STALE_AFTER)
+        )
+        job = cur.fetchone()
+    conn.commit()
+    return job
+
+
+@timed(DB_SECONDS, operation='get_credentials')
+def get_credentials(conn, job_id):
+    """The credentials queued with a job, or {} (none, or the job is already finished)."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT credentials FROM job_credentials WHERE job_id = %s", (job_id,))
+        row = cur.fetchone()
+    conn.commit()
+    return row[0] if row else {}
+
+
+def wait_for_jobs(conn, timeout):
+    # Block until a NOTIFY arrives on the job channel or the timeout expires
+    if select.select([conn], [], [], timeout) != ([], [], []):
+        conn.poll()
+        conn.notifies.clear()
+
+
+def listen(conn):
+    with conn.cursor() as cur:
+        cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+    conn.commit()
+
+
+@timed(DB_SECONDS, operation='update_progress')
+def update_progress(conn, job_id, done, total):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE scrape_jobs SET progress = %s, progress_total = %s, heartbeat_at = now()
+            WHERE job_id = %s
+            """,
+            (done, total, job_id)
+        )
+    conn.commit()
+
+
+class Heartbeat:
+    """Keeps a claimed job's heartbeat fresh from a background thread while the job runs.
+
+    Phases that report no progress for a while (a long harvest or tile fan-out) would otherwise
+    look abandoned and be claimed by another worker. Uses its own connection, since the
+    worker's connection belongs to the job's thread.
+    """
+
+    def __init__(self, job_id, worker_id, interval=JOB_HEARTBEAT_INTERVAL):
+        self.job_id = str(job_id)
+        self.worker_id = worker_id
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"heartbeat-{self.job_id}")
+
+    def _beat(self, conn):
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE scrape_jobs SET heartbeat_at = now() WHERE job_id = %s AND worker = %s AND status = 'running'",
+                (self.job_id, self.worker_id)
+            )
+        conn.commit()
+
+    def _run(self):
+        conn = None
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    if conn is None or conn.closed:
+                        conn = get_db_connection()
+                    if conn:
+                        self._beat(conn)
+                except Exception as e:
+                    print(f"Error sending the heartbeat of job {self.job_id}: {e}")
+                    if conn and not conn.closed:
+                        conn.close()
+                    conn = None
+        finally:
+            if conn and not conn.closed:
+                conn.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+@timed(DB_SECONDS, operation='complete_job')
+def complete_job(conn, job_id, result):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE scrape_jobs
+            SET status = 'done', result = %s, progress = COALESCE(progress_total, progress), finished_at = now()
+            WHERE job_id = %s
+            """,
+            (Json(result), job_id)
+        )
+        cur.execute("DELETE FROM job_credentials WHERE job_id = %s", (job_id,))
+    conn.commit()
+
+
+@timed(DB_SECONDS, operation='fail_job')
+def fail_job(conn, job_id, error, retry=False):
+    # Retried jobs go back to the queue; the attempt counter is checked on the next claim
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE scrape_jobs
+            SET status = CASE WHEN %s AND attempts < %s THEN 'queued' ELSE 'failed' END,
+                error = %s,
+                finished_at = CASE WHEN %s AND attempts < %s THEN NULL ELSE now() END
+            WHERE job_id = %s
+            """,
+            (retry, JOB_MAX_ATTEMPTS, error, retry, JOB_MAX_ATTEMPTS, job_id)
+        )
+        # A job going back to the queue keeps its credentials for the next attempt
+        cur.execute(
+            "DELETE FROM job_credentials c USING scrape_jobs j "
+            "WHERE c.job_id = j.job_id AND j.job_id = %s AND j.status = 'failed'",
+            (job_id,)
+        )
+    conn.commit()
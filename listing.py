@@ -0,0 +1,118 @@
+import hashlib
+import re
+
+from phones import to_e164
+
+
+# Result row columns as served by the API (see Listing.to_row)
+COLUMNS = [
+    'Names', 'Website', 'Introduction', 'Phone Number', 'Address', 'Review Count',
+    'Average Review Count', 'Store Shopping', 'In Store Pickup', 'Delivery', 'Type', 'Opens At', 'Place ID'
+]
+
+
+# Fields whose value depends on when the place was looked at
+_TIME_DEPENDENT = ('opens_at', 'open_now')
+
+
+def _number(text):
+    return None if text in (None, "", "N/A") else text
+
+
+def _digest(values):
+    return hashlib.sha1('\x1f'.join('' if value is None else str(value) for value in values).encode()).hexdigest()[:16]
+
+
+def header_hash(name, rating, review_count):
+    """Hash of what both a feed card and a place header show: name, rating and review count."""
+    return _digest((name, None if rating is None else f"{float(rating):.1f}", review_count))
+
+
+class Listing:
+    """One scraped place with typed fields; missing values are None (flags default to False)."""
+
+    __slots__ = (
+        'place_id', 'name', 'website', 'introduction', 'phone', 'phone_e164', 'address', 'review_count',
+        'rating', 'store_shopping', 'in_store_pickup', 'delivery', 'type', 'opens_at', 'open_now',
+    )
+
+    def __init__(self, place_id=None, name=None, website=None, introduction=None, phone=None,
+                 phone_e164=None, address=None, review_count=None, rating=None, store_shopping=False,
+                 in_store_pickup=False, delivery=False, type=None, opens_at=None, open_now=None):
+        self.place_id = place_id
+        self.name = name
+        self.website = website
+        self.introduction = introduction
+        self.phone = phone
+        self.phone_e164 = phone_e164
+        self.address = address
+        self.review_count = review_count
+        self.rating = rating
+        self.store_shopping = store_shopping
+        self.in_store_pickup = in_store_pickup
+        self.delivery = delivery
+        self.type = type
+        self.opens_at = opens_at
+        self.open_now = open_now
+
+    def key(self):
+        # Listings with the same name, phone and address are treated as duplicates
+        return (self.name, self.phone, self.address)
+
+    def header_hash(self):
+        return header_hash(self.name, self.rating, self.review_count)
+
+    def content_hash(self):
+        # Every scraped field except the opening state, which changes with the time of day
+        # ("Open ⋅ Closes 11 PM" / "Closed ⋅ Opens 9 AM"); equal hashes mean a refresh found nothing new
+        return _digest(getattr(self, field) for field in self.__slots__ if field not in _TIME_DEPENDENT)
+
+    def to_row(self):
+        """The result row served by the API, cached and exported as CSV (original column names)."""
+        return {
+            'Names': self.name or "N/A",
+            'Website': self.website or "N/A",
+            'Introduction': self.introduction or "N/A",
+            'Phone Number': self.phone or "N/A",
+            'Address': self.address or "N/A",
+            'Review Count': "" if self.review_count is None else str(self.review_count),
+            'Average Review Count': "" if self.rating is None else str(self.rating),
+            'Store Shopping': "Yes" if self.store_shopping else "No",
+            'In Store Pickup': "Yes" if self.in_store_pickup else "No",
+            'Delivery': "Yes" if self.delivery else "No",
+            'Type': self.type or "N/A",
+            'Opens At': self.opens_at or "",
+            'Place ID': self.place_id,
+        }
+
+    @classmethod
+    def from_row(cls, row):
+        """Rebuild a listing from a result row, e.g. one served from the search cache."""
+        def text(column):
+            value = row.get(column)
+            return None if value in (None, "", "N/A") else value
+
+        phone = text('Phone Number')
+        review_count = _number(row.get('Review Count'))
+        rating = _number(row.get('Average Review Count'))
+        opens_at = text('Opens At')
+        return cls(
+            place_id=row.get('Place ID'),
+            name=text('Names'),
+            website=text('Website'),
+            introduction=text('Introduction'),
+            phone=phone,
+            phone_e164=to_e164(phone) if phone else None,
+            address=text('Address'),
+            review_count=int(review_count) if review_count is not None else None,
+            rating=float(rating) if rating is not None else None,
+            store_shopping=row.get('Store Shopping') == "Yes",
+            in_store_pickup=row.get('In Store Pickup') == "Yes",
+            delivery=row.get('Delivery') == "Yes",
+            type=text('Type'),
+            opens_at=opens_at,
+            open_now=None if opens_at is None else bool(re.match(r'Open\b', opens_at)),
+        )
+
+    def __repr__(self):
+        return f"<Listing {self.name}, ID: {self.place_id}>"
@@ -0,0 +1,290 @@
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import ContextDecorator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Per-job trace files are written here when tracing is on (see Trace)
+TRACE_DIR = os.getenv('TRACE_DIR', 'traces')
+# Interface the worker exporter (serve) binds to; set to 0.0.0.0 to let a remote Prometheus scrape it
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+# When set, the worker exporter requires `Authorization: Bearer <token>`, like the web app's /metrics
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+JOB_TRACE = os.getenv('JOB_TRACE', '0') != '0'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_labels(self.labelnames, key)} {value}" for key, value in sorted(values.items())]
+
+
+class Gauge(_Metric):
+    """A gauge read from a callback at scrape time; the callback returns {label tuple: value}."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def collect(self):
+        try:
+            values = self.function() if self.function else {}
+        except Exception as e:
+            print(f"Error collecting gauge {self.name}: {e}")
+            values = {}
+        return [f"{self.name}{_labels(self.labelnames, key)} {value}" for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        return timed(self, **labels)
+
+    def collect(self):
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        lines = []
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+# --- Per-job traces -------------------------------------------------------------------------
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+
+
+class Trace:
+    """Timed spans of one job, written as JSON lines to TRACE_DIR/<name>.jsonl on close.
+
+    Activate it with `with trace:`; spans recorded by timed() in that context (and in threads
+    started through run_in_context) are added to it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.path = os.path.join(TRACE_DIR, f"{name}.jsonl")
+        self.started = time.perf_counter()
+        self.events = []
+        self._lock = threading.Lock()
+        self._token = None
+
+    def add(self, metric, seconds, labels):
+        event = {
+            'metric': metric,
+            'start': round(time.perf_counter() - seconds - self.started, 6),
+            'seconds': round(seconds, 6),
+            'thread': threading.current_thread().name,
+        }
+        event.update(labels)
+        with self._lock:
+            self.events.append(event)
+
+    def __enter__(self):
+        self._token = _current_trace.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _current_trace.reset(self._token)
+        self.write()
+
+    def write(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._lock:
+            events = sorted(self.events, key=lambda event: event['start'])
+        with open(self.path, 'w', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(event) + '\n')
+        return self.path
+
+
+def run_in_context(function):
+    """Wrap `function` to run in the caller's context, so executor threads see the active trace."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(function, *args, **kwargs)
+
+
+class timed(ContextDecorator):
+    """Observe the duration of a block (or decorated function) in `histogram`, and trace it.
+
+    The span added to the active trace carries the histogram name and the labels.
+    """
+
+    def __init__(self, histogram, **labels):
+        self.histogram = histogram
+        self.labels = labels
+        self._local = threading.local()
+
+    def __enter__(self):
+        self._local.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self._local.started
+        self.histogram.observe(seconds, **self.labels)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(self.histogram.name, seconds, self.labels)
+        return False
+
+
+def observe(histogram, seconds, **labels):
+    """Record a duration measured elsewhere (e.g. inside the page) like timed() does."""
+    histogram.observe(seconds, **labels)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(histogram.name, seconds, labels)
+
+
+# --- Standalone exporter for processes without a web server (workers) ---------------------
+
+def serve(port, host=METRICS_HOST):
+    """Serve /metrics on `host`:`port` from a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_response(404)
+                self.end_headers()
+                return
+            if METRICS_TOKEN and self.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+                self.send_response(401)
+                self.end_headers()
+                return
+            body = REGISTRY.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name='metrics').start()
+    print(f"Info: Metrics served on {host}:{port}.")
+    return server
+
+
+# --- Metrics shared across modules -------------------------------------------------------
+
+SCRAPER_PHASE_SECONDS = Histogram(
+    'scraper_phase_seconds', "Duration of scraper phases (launch, load, search, scroll, goto, click, extract, ...)",
+    ['phase'])
+SCRAPER_LISTING_SECONDS = Histogram(
+    'scraper_listing_seconds', "Time to open and extract one listing's detail panel")
+SCRAPER_FIELD_SECONDS = Histogram(
+    'scraper_field_seconds', "In-page time to evaluate one field selector", ['field'],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+SCRAPER_FIELD_MISSING = Counter(
+    'scraper_field_missing_total', "Fields with no matching node, served as N/A", ['field'])
+SCRAPER_TIMEOUTS = Counter('scraper_timeouts_total', "Playwright timeouts by phase", ['phase'])
+SCRAPER_ERRORS = Counter('scraper_errors_total', "Listings that failed to extract", ['phase'])
+SCRAPER_LISTINGS = Counter('scraper_listings_total', "Listings extracted")
+SCRAPER_REQUESTS = Counter(
+    'scraper_requests_total', "Browser requests seen by the resource policy, blocked or allowed, by resource type",
+    ['outcome', 'type'])
+SCRAPER_BLOCKED_BYTES = Counter(
+    'scraper_blocked_bytes_estimate_total', "Estimated bytes not downloaded because requests were blocked", ['type'])
+
+VAPI_REQUEST_SECONDS = Histogram('vapi_request_seconds', "Duration of VAPI call requests", ['source'])
+VAPI_RESPONSES = Counter('vapi_responses_total', "VAPI call responses by HTTP status ('error' for no response)",
+                         ['source', 'status'])
+
+DB_SECONDS = Histogram('db_operation_seconds', "Duration of database operations", ['operation'])
@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask import Flask
 from uuid import uuid4
+from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
 # Initialize the database object
@@ -30,3 +31,54 @@ class User(db.Model):
     # Representation for easy inspection in the debugger or logs
     def __repr__(self):
         return f"<User {self.name}, Email: {self.email}>"
+
+
+class Place(db.Model):
+    # One row per Google Maps place, shared by every search that returned it
+    __tablename__ = 'places'
+
+    place_id = db.Column(db.String(255), primary_key=True)
+    name = db.Column(db.String(255), index=True)
+    website = db.Column(db.String(255))
+    introduction = db.Column(db.Text)
+    phone = db.Column(db.String(50), index=True)
+    phone_e164 = db.Column(db.String(16), index=True)
+    address = db.Column(db.Text)
+    review_count = db.Column(db.Integer)
+    rating = db.Column(db.Float)
+    store_shopping = db.Column(db.Boolean)
+    in_store_pickup = db.Column(db.Boolean)
+    delivery = db.Column(db.Boolean)
+    type = db.Column(db.String(100), index=True)
+    opens_at = db.Column(db.Text)
+    first_seen_at = db.Column(db.DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    last_scraped_at = db.Column(db.DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    # Refreshes (see freshness.py): hashes of the header and of every field, and the last time
+    # the place was confirmed unchanged without a full extraction
+    header_hash = db.Column(db.String(16))
+    content_hash = db.Column(db.String(16))
+    last_checked_at = db.Column(db.DateTime(timezone=True))
+
+    def __repr__(self):
+        return f"<Place {self.name}, ID: {self.place_id}>"
+
+
+class SearchRun(db.Model):
+    # One row per executed search (job or streamed query)
+    __tablename__ = 'search_runs'
+
+    run_id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid4()))
+    job_id = db.Column(db.String(36), index=True)
+    search_term = db.Column(db.String(255), nullable=False, index=True)
+    total = db.Column(db.Integer, nullable=False)
+    result_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+
+
+class SearchRunPlace(db.Model):
+    # Links a search run to the places it returned, in result order
+    __tablename__ = 'search_run_places'
+
+    run_id = db.Column(db.String(36), db.ForeignKey('search_runs.run_id', ondelete='CASCADE'), primary_key=True)
+    place_id = db.Column(db.String(255), db.ForeignKey('places.place_id'), primary_key=True, index=True)
+    position = db.Column(db.Integer, nullable=False)
@@ -0,0 +1,112 @@
+import os
+import re
+
+import pandas as pd
+
+from extractors import SELECTORS
+from listing import Listing
+from phones import normalize_phones, to_e164
+
+TEXT_FIELDS = ['name', 'website', 'introduction', 'phone', 'address', 'type']
+
+# Batches of at least this many records are parsed column-wise in one pandas pass; smaller
+# ones (a streamed listing, a few finished detail records) row by row, which costs microseconds
+NORMALIZE_FRAME_MIN = int(os.getenv('NORMALIZE_FRAME_MIN', 256))
+
+_NON_DIGITS = re.compile(r'\D')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_frame(raw):
+    """Parse a frame of raw extracted fields (one column per SELECTORS key, plus place_id).
+
+    Every column is cleaned in one vectorized pass. Returns a frame with one typed column
+    per Listing field, in the same row order.
+    """
+    raw = raw.reindex(columns=list(SELECTORS) + ['place_id']).astype('string')
+    out = pd.DataFrame(index=raw.index)
+    out['place_id'] = raw['place_id']
+
+    for field in TEXT_FIELDS:
+        text = raw[field].str.strip()
+        out[field] = text.mask(text == "")
+
+    out['phone_e164'] = normalize_phones(out['phone'])
+
+    # "(1,969)" / "(1.969)" / "1 969" -> 1969
+    digits = raw['review_count'].str.replace(r'\D', '', regex=True)
+    out['review_count'] = pd.to_numeric(digits.mask(digits == ""), errors='coerce').astype('Int64')
+
+    # "4,1" / "4.1 " -> 4.1
+    rating = raw['review_average'].str.replace(r'\s', '', regex=True).str.replace(',', '.', regex=False)
+    out['rating'] = pd.to_numeric(rating.mask(rating == ""), errors='coerce').astype('Float64')
+
+    services = raw['services'].fillna("")
+    out['store_shopping'] = services.str.contains('shop', regex=False).astype(bool)
+    out['in_store_pickup'] = services.str.contains('pickup', regex=False).astype(bool)
+    out['delivery'] = services.str.contains('delivery', regex=False).astype(bool)
+
+    # "Open ⋅ Closes 11 PM" / "Closed ⋅ Opens 12 PM Mon" / "Open 24 hours", newlines collapsed
+    hours = raw['opening_hours'].str.replace(r'\s+', ' ', regex=True).str.strip()
+    hours = hours.mask(hours == "")
+    out['opens_at'] = hours
+    out['open_now'] = hours.str.match(r'Open\b').astype('boolean')
+
+    return out[list(Listing.__slots__)]
+
+
+def _text(value):
+    if value is None:
+        return None
+    return value.strip() or None
+
+
+def normalize_record(record):
+    """Parse one extraction record into a Listing, row by row; same results as normalize_frame."""
+    fields = record['fields']
+    text = {field: _text(fields.get(field)) for field in TEXT_FIELDS}
+
+    digits = _NON_DIGITS.sub('', fields.get('review_count') or '')
+    rating = _WHITESPACE.sub('', fields.get('review_average') or '').replace(',', '.')
+    try:
+        rating = float(rating) if rating else None
+    except ValueError:
+        rating = None
+
+    services = fields.get('services') or ''
+    hours = _WHITESPACE.sub(' ', fields.get('opening_hours') or '').strip() or None
+    return Listing(
+        place_id=record['place_id'],
+        phone_e164=to_e164(text['phone']) if text['phone'] else None,
+        review_count=int(digits) if digits else None,
+        rating=rating,
+        store_shopping='shop' in services,
+        in_store_pickup='pickup' in services,
+        delivery='delivery' in services,
+        opens_at=hours,
+        open_now=None if hours is None else bool(re.match(r'Open\b', hours)),
+        **text,
+    )
+
+
+def normalize_records(records):
+    """Turn extraction records ({'place_id', 'fields'}) into typed Listing objects, in order."""
+    if not records:
+        return []
+    if len(records) < NORMALIZE_FRAME_MIN:
+        # Building a DataFrame costs milliseconds, far more than parsing a few rows
+        return [normalize_record(record) for record in records]
+    raw = pd.DataFrame.from_records([record['fields'] for record in records])
+    raw['place_id'] = [record['place_id'] for record in records]
+    typed = normalize_frame(raw).astype(object)
+    typed = typed.where(typed.notna(), None)
+    return [Listing(**values) for values in typed.to_dict(orient='records')]
+
+
+def listings_frame(listings):
+    """Column-wise DataFrame of typed listings; every column has exactly one value per listing."""
+    frame = pd.DataFrame({field: [getattr(listing, field) for listing in listings] for field in Listing.__slots__})
+    return frame.astype({
+        'review_count': 'Int64', 'rating': 'Float64', 'store_shopping': bool,
+        'in_store_pickup': bool, 'delivery': bool, 'open_now': 'boolean',
+    })
@@ -0,0 +1,56 @@
+import os
+import re
+
+# Country calling code (digits only, e.g. "92") assumed for numbers written in national form
+DEFAULT_COUNTRY_CODE = os.getenv('DEFAULT_COUNTRY_CODE', '').lstrip('+')
+
+_EXTENSION = re.compile(r'(?i)\s*(?:ext\.?|x)\s*\d+$')
+_NON_DIGITS = re.compile(r'\D')
+_E164_DIGITS = re.compile(r'[1-9]\d{7,14}')
+
+
+def normalize_phones(numbers, country_code=None):
+    """Vectorized E.164 normalization of display-form phone numbers.
+
+    "+92 42 35830819" -> "+924235830819", "0042 ..." -> "+42...", and "042 35830819" uses
+    `country_code` (default DEFAULT_COUNTRY_CODE). Numbers that cannot be made E.164
+    (national form without a country code, too short or too long) become missing.
+    Returns a string Series aligned with `numbers`.
+    """
+    import pandas as pd  # Imported on first use so web processes that never see a number start faster
+
+    country_code = DEFAULT_COUNTRY_CODE if country_code is None else country_code
+    raw = pd.Series(numbers, dtype='string').str.strip()
+    # Drop extensions ("ext. 12", "x12") before keeping digits
+    raw = raw.str.replace(r'(?i)\s*(?:ext\.?|x)\s*\d+$', '', regex=True)
+
+    international = raw.str.startswith('+')
+    digits = raw.str.replace(r'\D', '', regex=True)
+    dialed_out = ~international & digits.str.startswith('00')
+    digits = digits.mask(dialed_out, digits.str.slice(2))
+    national = ~international & ~dialed_out
+    if country_code:
+        digits = digits.mask(national, country_code + digits.str.replace(r'^0+', '', regex=True))
+    else:
+        digits = digits.mask(national, pd.NA)
+
+    valid = digits.str.fullmatch(r'[1-9]\d{7,14}').fillna(False).astype(bool)
+    return ('+' + digits).where(valid)
+
+
+def to_e164(number, country_code=None):
+    """E.164 form of one number, or None; the per-number form of normalize_phones, without pandas."""
+    if number is None:
+        return None
+    country_code = DEFAULT_COUNTRY_CODE if country_code is None else country_code
+    raw = _EXTENSION.sub('', str(number).strip())
+    digits = _NON_DIGITS.sub('', raw)
+    if raw.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif country_code:
+        digits = country_code + digits.lstrip('0')
+    else:
+        return None
+    return '+' + digits if _E164_DIGITS.fullmatch(digits) else None
@@ -0,0 +1,235 @@
+import base64
+import csv
+import io
+import json
+import os
+import uuid
+import zlib
+
+from psycopg2.extras import RealDictCursor
+
+from db import get_db_connection
+from listing import COLUMNS
+from metrics import DB_SECONDS, timed
+from places_store import listing_from_place
+
+PLACES_PAGE_SIZE = int(os.getenv('PLACES_PAGE_SIZE', 100))
+PLACES_MAX_PAGE_SIZE = int(os.getenv('PLACES_MAX_PAGE_SIZE', 1000))
+# Rows fetched per round-trip by the server-side cursor of an export
+PLACES_EXPORT_FETCH = int(os.getenv('PLACES_EXPORT_FETCH', 2000))
+
+_FIELDS = """
+    place_id, name, website, introduction, phone, phone_e164, address, review_count, rating,
+    store_shopping, in_store_pickup, delivery, type, opens_at, last_scraped_at
+"""
+
+# sort name -> (keyset expression, direction); place_id breaks ties, and the expressions match
+# the indexes created in places_store.ensure_schema
+SORTS = {
+    'place_id': (None, 'ASC'),
+    'rating': ('COALESCE(rating, -1)', 'DESC'),
+    'reviews': ('COALESCE(review_count, -1)', 'DESC'),
+}
+
+_FLAGS = ('delivery', 'in_store_pickup', 'store_shopping')
+
+
+def _flag(value, name):
+    lowered = str(value).lower()
+    if lowered in ('1', 'true', 'yes'):
+        return True
+    if lowered in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f"{name} must be true or false")
+
+
+def parse_filters(args):
+    """Validate the filters of a places request (query string args); raises ValueError."""
+    filters = {}
+    if args.get('type'):
+        filters['type'] = args['type']
+    if args.get('q'):
+        if len(args['q']) < 3:
+            raise ValueError("q must be at least 3 characters")
+        filters['q'] = args['q']
+    if args.get('min_rating') not in (None, ''):
+        filters['min_rating'] = float(args['min_rating'])
+        if not 0 <= filters['min_rating'] <= 5:
+            raise ValueError("min_rating must be between 0 and 5")
+    if args.get('min_reviews') not in (None, ''):
+        filters['min_reviews'] = int(args['min_reviews'])
+        if filters['min_reviews'] < 0:
+            raise ValueError("min_reviews must be 0 or more")
+    for flag in _FLAGS:
+        if args.get(flag) not in (None, ''):
+            filters[flag] = _flag(args[flag], flag)
+    if args.get('job_id'):
+        # Only the places a scrape job returned
+        filters['job_id'] = str(uuid.UUID(args['job_id']))
+    return filters
+
+
+def _where(filters):
+    clauses = []
+    params = []
+    if 'type' in filters:
+        clauses.append("type = %s")
+        params.append(filters['type'])
+    if 'q' in filters:
+        # Substring match on name or address, served by the trigram indexes
+        pattern = '%' + filters['q'].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        clauses.append("(name ILIKE %s OR address ILIKE %s)")
+        params.extend([pattern, pattern])
+    if 'min_rating' in filters:
+        clauses.append("rating >= %s")
+        params.append(filters['min_rating'])
+    if 'min_reviews' in filters:
+        clauses.append("review_count >= %s")
+        params.append(filters['min_reviews'])
+    for flag in _FLAGS:
+        if flag in filters:
+            clauses.append(f"{flag} = %s")
+            params.append(filters[flag])
+    if 'job_id' in filters:
+        clauses.append(
+            "place_id IN (SELECT srp.place_id FROM search_run_places srp"
+            " JOIN search_runs sr ON sr.run_id = srp.run_id WHERE sr.job_id = %s)"
+        )
+        params.append(filters['job_id'])
+    return clauses, params
+
+
+def _order(sort):
+    expression, direction = SORTS[sort]
+    if expression is None:
+        return f"place_id {direction}"
+    return f"{expression} {direction}, place_id {direction}"
+
+
+def encode_cursor(sort, row):
+    expression = SORTS[sort][0]
+    key = [row['place_id']] if expression is None else [row['_key'], row['place_id']]
+    return base64.urlsafe_b64encode(json.dumps([sort] + key).encode()).decode()
+
+
+def decode_cursor(cursor, sort):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or not values or values[0] != sort:
+        raise ValueError("The cursor belongs to a different sort order")
+    key = values[1:]
+    # [place_id] for the place_id sort, [sort key, place_id] for the others
+    if SORTS[sort][0] is None:
+        valid = len(key) == 1
+    else:
+        valid = (len(key) == 2 and isinstance(key[0], (int, float))
+                 and not isinstance(key[0], bool))
+    if not valid or not isinstance(key[-1], str):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+@timed(DB_SECONDS, operation='query_places')
+def query_places(filters, sort='place_id', after=None, limit=PLACES_PAGE_SIZE):
+    """One page of stored places matching `filters`, in `sort` order after the cursor `after`.
+
+    Keyset pagination: every page is an index range scan, however deep. Returns
+    (rows, next cursor or None).
+    """
+    clauses, params = _where(filters)
+    expression, direction = SORTS[sort]
+    if after:
+        key = decode_cursor(after, sort)
+        comparison = '>' if direction == 'ASC' else '<'
+        if expression is None:
+            clauses.append(f"place_id {comparison} %s")
+        else:
+            clauses.append(f"({expression}, place_id) {comparison} (%s, %s)")
+        params.extend(key)
+
+    key_column = f", {expression} AS _key" if expression else ""
+    query = (f"SELECT {_FIELDS}{key_column} FROM places"
+             + (" WHERE " + " AND ".join(clauses) if clauses else "")
+             + f" ORDER BY {_order(sort)} LIMIT %s")
+
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection error")
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            # One extra row tells whether there is a next page
+            cur.execute(query, params + [limit + 1])
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    next_cursor = encode_cursor(sort, rows[limit - 1]) if len(rows) > limit else None
+    rows = rows[:limit]
+    for row in rows:
+        row.pop('_key', None)
+    return rows, next_cursor
+
+
+def _stream(conn, cur, first):
+    try:
+        # Primed by iter_places, so closing the generator always reaches the finally
+        yield
+        yield from first
+        yield from cur
+    finally:
+        conn.close()
+
+
+def iter_places(filters, sort='place_id'):
+    """Every stored place matching `filters`, read through a server-side cursor.
+
+    Connects, runs the query and fetches the first PLACES_EXPORT_FETCH rows before returning,
+    so database errors are raised here rather than halfway through a streamed response. The
+    returned generator holds the connection until it is exhausted or closed; memory stays at
+    one fetch however many places match.
+    """
+    clauses, params = _where(filters)
+    query = (f"SELECT {_FIELDS} FROM places"
+             + (" WHERE " + " AND ".join(clauses) if clauses else "")
+             + f" ORDER BY {_order(sort)}")
+
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection error")
+    try:
+        cur = conn.cursor(name=f"places_export_{uuid.uuid4().hex}", cursor_factory=RealDictCursor)
+        cur.itersize = PLACES_EXPORT_FETCH
+        cur.execute(query, params)
+        first = cur.fetchmany(PLACES_EXPORT_FETCH)
+    except Exception:
+        conn.close()
+        raise
+    rows = _stream(conn, cur, first)
+    next(rows)
+    return rows
+
+
+def iter_csv_gz(rows, flush_every=1000):
+    """Gzip-compressed CSV (the export columns, see listing.COLUMNS) of places rows, in chunks."""
+    # wbits 31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    try:
+        for count, row in enumerate(rows, 1):
+            writer.writerow(listing_from_place(row).to_row())
+            if count % flush_every == 0:
+                chunk = compressor.compress(buffer.getvalue().encode('utf-8'))
+                buffer.seek(0)
+                buffer.truncate()
+                if chunk:
+                    yield chunk
+    finally:
+        # Releases the connection of iter_places when the download stops early
+        close = getattr(rows, 'close', None)
+        if close:
+            close()
+    yield compressor.compress(buffer.getvalue().encode('utf-8')) + compressor.flush()
@@ -0,0 +1,161 @@
+import os
+import re
+import uuid
+
+from psycopg2.extras import execute_values
+from sqlalchemy import create_engine, text
+
+from db import DATABASE_URI, get_db_connection
+from metrics import DB_SECONDS, timed
+from listing import Listing
+from model import db, Place, SearchRun, SearchRunPlace
+
+# Rows per multi-row INSERT statement
+PLACES_BATCH_SIZE = int(os.getenv('PLACES_BATCH_SIZE', 500))
+
+_INSERT_PLACES = """
+INSERT INTO places (
+    place_id, name, website, introduction, phone, phone_e164, address, review_count, rating,
+    store_shopping, in_store_pickup, delivery, type, opens_at, header_hash, content_hash,
+    first_seen_at, last_scraped_at, last_checked_at
+) VALUES %s
+"""
+_ON_CONFLICT_UPDATE = """
+ON CONFLICT (place_id) DO UPDATE SET
+    name = EXCLUDED.name,
+    website = EXCLUDED.website,
+    introduction = EXCLUDED.introduction,
+    phone = EXCLUDED.phone,
+    phone_e164 = EXCLUDED.phone_e164,
+    address = EXCLUDED.address,
+    review_count = EXCLUDED.review_count,
+    rating = EXCLUDED.rating,
+    store_shopping = EXCLUDED.store_shopping,
+    in_store_pickup = EXCLUDED.in_store_pickup,
+    delivery = EXCLUDED.delivery,
+    type = EXCLUDED.type,
+    opens_at = EXCLUDED.opens_at,
+    header_hash = EXCLUDED.header_hash,
+    content_hash = EXCLUDED.content_hash,
+    last_scraped_at = EXCLUDED.last_scraped_at,
+    last_checked_at = EXCLUDED.last_checked_at
+"""
+_PLACE_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, now(), now(), now())"
+
+
+def ensure_schema():
+    # The models in model.py are the source of truth for these tables
+    engine = create_engine(DATABASE_URI)
+    try:
+        db.metadata.create_all(engine, tables=[Place.__table__, SearchRun.__table__, SearchRunPlace.__table__])
+        # Columns added after the table was first created
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE places ADD COLUMN IF NOT EXISTS phone_e164 VARCHAR(16)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_places_phone_e164 ON places (phone_e164)"))
+            conn.execute(text("ALTER TABLE places ADD COLUMN IF NOT EXISTS header_hash VARCHAR(16)"))
+            conn.execute(text("ALTER TABLE places ADD COLUMN IF NOT EXISTS content_hash VARCHAR(16)"))
+            conn.execute(text("ALTER TABLE places ADD COLUMN IF NOT EXISTS last_checked_at TIMESTAMPTZ"))
+            # Keyset indexes for the rating and review count orders of places_query.SORTS
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_places_rating_key ON places ((COALESCE(rating, -1)), place_id)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_places_review_count_key "
+                "ON places ((COALESCE(review_count, -1)), place_id)"
+            ))
+        try:
+            # Trigram indexes serve the substring search on name and address
+            with engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_places_name_trgm ON places USING gin (name gin_trgm_ops)"
+                ))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_places_address_trgm ON places USING gin (address gin_trgm_ops)"
+                ))
+        except Exception as e:
+            print(f"Info: Text search on places runs without trigram indexes ({e}).")
+    finally:
+        engine.dispose()
+
+
+def place_values(listing):
+    return (
+        listing.place_id, listing.name, listing.website, listing.introduction, listing.phone, listing.phone_e164,
+        listing.address, listing.review_count, listing.rating, listing.store_shopping,
+        listing.in_store_pickup, listing.delivery, listing.type, listing.opens_at,
+        listing.header_hash(), listing.content_hash(),
+    )
+
+
+def listing_from_place(row):
+    """Rebuild a Listing from a places row (a mapping)."""
+    opens_at = row['opens_at']
+    return Listing(
+        place_id=row['place_id'], name=row['name'], website=row['website'], introduction=row['introduction'],
+        phone=row['phone'], phone_e164=row['phone_e164'], address=row['address'],
+        review_count=row['review_count'], rating=row['rating'], store_shopping=bool(row['store_shopping']),
+        in_store_pickup=bool(row['in_store_pickup']), delivery=bool(row['delivery']), type=row['type'],
+        opens_at=opens_at, open_now=None if opens_at is None else bool(re.match(r'Open\b', opens_at)),
+    )
+
+
+def upsert_places(cur, listings, refresh=True):
+    """Multi-row insert of listings into places; existing places are only updated when `refresh`."""
+    # ON CONFLICT cannot touch the same row twice in one statement, so keep the last listing per place
+    by_id = {}
+    for listing in listings:
+        if listing.place_id:
+            by_id[listing.place_id] = place_values(listing)
+    conflict = _ON_CONFLICT_UPDATE if refresh else "ON CONFLICT (place_id) DO NOTHING"
+    execute_values(cur, _INSERT_PLACES + conflict, list(by_id.values()), template=_PLACE_TEMPLATE,
+                   page_size=PLACES_BATCH_SIZE)
+    return len(by_id)
+
+
+@timed(DB_SECONDS, operation='save_run')
+def save_run(search_term, total, listings, job_id=None, fresh=True, reused=()):
+    """Store a search run, link it to its places and write the places.
+
+    Places are updated only for `fresh` listings; cached ones just fill in places that are missing.
+    Places whose id is in `reused` were read from the places table by a refresh and are only linked.
+    Listings without a place id (e.g. cached before place ids existed) are skipped. Returns the run id.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection error")
+    try:
+        run_id = str(uuid.uuid4())
+        positions = {}
+        for position, listing in enumerate(listings):
+            if listing.place_id:
+                positions.setdefault(listing.place_id, position)
+
+        with conn.cursor() as cur:
+            reused = set(reused)
+            written = upsert_places(cur, [listing for listing in listings if listing.place_id not in reused],
+                                    refresh=fresh)
+            cur.execute(
+                """
+                INSERT INTO search_runs (run_id, job_id, search_term, total, result_count, created_at)
+                VALUES (%s, %s, %s, %s, %s, now())
+                """,
+                (run_id, job_id, search_term, total, len(listings))
+            )
+            execute_values(
+                cur,
+                """
+                INSERT INTO search_run_places (run_id, place_id, position) VALUES %s
+                ON CONFLICT DO NOTHING
+                """,
+                [(run_id, place_id, position) for place_id, position in positions.items()],
+                page_size=PLACES_BATCH_SIZE
+            )
+        conn.commit()
+        print(f"Info: Search run {run_id} stored with {len(positions)} places ({written} written).")
+        return run_id
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
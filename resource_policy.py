@@ -0,0 +1,71 @@
+import os
+import re
+
+from metrics import SCRAPER_BLOCKED_BYTES, SCRAPER_REQUESTS
+
+# The scraper only reads text from the side panel; everything below is dead weight for it
+SCRAPER_BLOCK_RESOURCES = os.getenv('SCRAPER_BLOCK_RESOURCES', '1') != '0'
+
+DEFAULT_BLOCKED_TYPES = ['image', 'media', 'font']
+DEFAULT_BLOCKED_URLS = [
+    r'/maps/vt',                          # vector and raster map tiles
+    r'khms\d*\.google',                   # satellite imagery
+    r'streetviewpixels',                  # street view thumbnails
+    r'lh\d+\.googleusercontent\.com',     # place photos
+    r'/maps/preview/(photo|pwa)',
+    r'/gen_204',                          # client logging beacons
+    r'play\.google\.com/log',
+]
+
+# Rough transfer sizes used to estimate what blocking saved, since aborted requests report no size
+ESTIMATED_BYTES = {'image': 25000, 'media': 250000, 'font': 40000}
+ESTIMATED_BYTES_OTHER = 5000
+
+
+def _env_list(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return list(default)
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class ResourcePolicy:
+    """Route interception that aborts unneeded requests on a browser context.
+
+    A request is blocked when its resource type or URL matches the block lists, unless
+    its URL matches the allow list. Every request is counted in scraper_requests_total, and
+    blocked ones add their estimated size to scraper_blocked_bytes_estimate_total.
+    """
+
+    def __init__(self, blocked_types=None, blocked_urls=None, allowed_urls=None):
+        self.blocked_types = set(blocked_types if blocked_types is not None else DEFAULT_BLOCKED_TYPES)
+        self.blocked_urls = [re.compile(p) for p in (blocked_urls if blocked_urls is not None else DEFAULT_BLOCKED_URLS)]
+        self.allowed_urls = [re.compile(p) for p in (allowed_urls or [])]
+
+    def should_block(self, resource_type, url):
+        if any(p.search(url) for p in self.allowed_urls):
+            return False
+        if resource_type in self.blocked_types:
+            return True
+        return any(p.search(url) for p in self.blocked_urls)
+
+    def _handle(self, route):
+        request = route.request
+        resource_type = request.resource_type
+        if self.should_block(resource_type, request.url):
+            SCRAPER_REQUESTS.inc(outcome='blocked', type=resource_type)
+            SCRAPER_BLOCKED_BYTES.inc(ESTIMATED_BYTES.get(resource_type, ESTIMATED_BYTES_OTHER), type=resource_type)
+            route.abort('blockedbyclient')
+        else:
+            SCRAPER_REQUESTS.inc(outcome='allowed', type=resource_type)
+            route.continue_()
+
+    def attach(self, context):
+        context.route('**/*', self._handle)
+
+
+default_policy = ResourcePolicy(
+    blocked_types=_env_list('SCRAPER_BLOCKED_TYPES', DEFAULT_BLOCKED_TYPES),
+    blocked_urls=DEFAULT_BLOCKED_URLS + _env_list('SCRAPER_BLOCKED_URLS', []),
+    allowed_urls=_env_list('SCRAPER_ALLOWED_URLS', []),
+)
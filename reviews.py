@@ -0,0 +1,312 @@
+import os
+import re
+from urllib.parse import urljoin
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+from psycopg2.extras import RealDictCursor, execute_values
+
+from db import get_db_connection
+from extractors import Deadline, wait_for_panel
+from metrics import DB_SECONDS, SCRAPER_PHASE_SECONDS, SCRAPER_TIMEOUTS, timed
+from scraper import MAPS_BASE_URL
+
+# Most new reviews read from one place in one run; the rest are left for the next run, which
+# passes over the ones already stored and carries on from there
+REVIEWS_MAX_PER_PLACE = int(os.getenv('REVIEWS_MAX_PER_PLACE', 500))
+# Most places in one reviews job
+REVIEWS_MAX_PLACES = int(os.getenv('REVIEWS_MAX_PLACES', 500))
+# Reviews per multi-row INSERT while a place is being read
+REVIEWS_BATCH_SIZE = int(os.getenv('REVIEWS_BATCH_SIZE', 50))
+# How long to wait for more reviews after a scroll before treating the list as exhausted (ms)
+REVIEWS_IDLE_TIMEOUT = int(os.getenv('REVIEWS_IDLE_TIMEOUT', 5000))
+# Newest review ids kept as a place's cursor; several, so one deleted review does not lose it
+REVIEWS_CURSOR_DEPTH = int(os.getenv('REVIEWS_CURSOR_DEPTH', 20))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS place_reviews (
+    place_id TEXT NOT NULL,
+    review_id TEXT NOT NULL,
+    author TEXT,
+    rating REAL,
+    -- As shown on Maps, e.g. "2 weeks ago"
+    published TEXT,
+    text TEXT,
+    -- Start of the run that read the review; the same for every batch of that run
+    scraped_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    -- Reading order; reviews are read newest first, so within a run a lower seq is newer
+    seq BIGSERIAL,
+    PRIMARY KEY (place_id, review_id)
+);
+CREATE INDEX IF NOT EXISTS place_reviews_scraped_idx ON place_reviews (place_id, scraped_at DESC, seq);
+CREATE TABLE IF NOT EXISTS review_cursors (
+    place_id TEXT PRIMARY KEY,
+    -- Newest review ids seen, newest first
+    recent_ids TEXT[] NOT NULL,
+    review_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+-- Set while a run has stopped at its limit before reaching the cursor (recent_ids, which did not
+-- move); the next run passes over the reviews already stored and carries on from there
+ALTER TABLE review_cursors ADD COLUMN IF NOT EXISTS backfill BOOLEAN NOT NULL DEFAULT false;
+"""
+
+# The reviews tab of a place panel, its sort menu and one review card with its fields (CSS)
+REVIEW_SELECTORS = {
+    'tab': 'button[role="tab"][aria-label^="Reviews"]',
+    'sort': 'button[aria-label="Sort reviews"]',
+    'newest': 'div[role="menuitemradio"][data-index="1"]',
+    'card': 'div.jftiEf[data-review-id]',
+    'author': '.d4r55',
+    'rating': 'span.kvMYJc[aria-label]',
+    'published': 'span.rsqaWe',
+    'text': 'span.wiI7pd',
+    'more': 'button.w8nwRe',
+}
+
+# Reads every review card not read before, expanding truncated texts, then scrolls to the last
+# card, in one round-trip. Stops at the first card whose id is in `known`; cards whose id was
+# installed by _SKIP_REVIEWS_JS are passed over. `seen` lists the ids of both, in order.
+_REVIEWS_JS = """
+({selectors, known}) => {
+    const items = [];
+    const seen = [];
+    const skip = window.__skipReviews || new Set();
+    let reachedKnown = false;
+    for (const card of document.querySelectorAll(selectors.card + ':not([data-review-read])')) {
+        card.dataset.reviewRead = '1';
+        const id = card.getAttribute('data-review-id');
+        if (known.includes(id)) {
+            reachedKnown = true;
+            break;
+        }
+        seen.push(id);
+        if (skip.has(id)) {
+            continue;
+        }
+        const more = card.querySelector(selectors.more);
+        if (more) {
+            more.click();
+        }
+        const text = (selector) => {
+            const node = card.querySelector(selector);
+            return node ? node.innerText : null;
+        };
+        const stars = card.querySelector(selectors.rating);
+        items.push({
+            review_id: id,
+            author: text(selectors.author),
+            rating: stars ? stars.getAttribute('aria-label') : null,
+            published: text(selectors.published),
+            text: text(selectors.text),
+        });
+    }
+    const cards = document.querySelectorAll(selectors.card);
+    if (!reachedKnown && cards.length) {
+        cards[cards.length - 1].scrollIntoView();
+    }
+    return {items: items, seen: seen, reached_known: reachedKnown};
+}
+"""
+
+# Installed once per place rather than sent with every scroll, as it can hold thousands of ids
+_SKIP_REVIEWS_JS = "(ids) => { window.__skipReviews = new Set(ids); }"
+
+_MORE_REVIEWS_JS = "(card) => document.querySelector(card + ':not([data-review-read])') !== null"
+
+_RATING_PATTERN = re.compile(r'(\d+(?:[.,]\d+)?)')
+_FEATURE_ID_PATTERN = re.compile(r'^0x[0-9a-f]+:(0x[0-9a-f]+)$')
+
+
+def ensure_schema(conn):
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA)
+    conn.commit()
+
+
+def place_url(place_id):
+    """A Maps URL that opens the place with `place_id` (any form harvest.place_id_from_url returns)."""
+    if place_id.startswith('ChIJ'):
+        return f"{MAPS_BASE_URL}/place/?q=place_id:{place_id}"
+    match = _FEATURE_ID_PATTERN.match(place_id)
+    if match:
+        # The second half of a feature id is the place's customer id (cid)
+        return f"{MAPS_BASE_URL}?cid={int(match.group(1), 16)}"
+    return urljoin(MAPS_BASE_URL + '/', place_id)
+
+
+def _parse_rating(label):
+    match = _RATING_PATTERN.search(label or '')
+    return float(match.group(1).replace(',', '.')) if match else None
+
+
+def _open_newest(page, deadline):
+    """Open the reviews tab sorted by newest; returns False when the place shows no reviews."""
+    try:
+        with timed(SCRAPER_PHASE_SECONDS, phase='reviews_open'):
+            page.locator(REVIEW_SELECTORS['tab']).first.click(timeout=deadline.remaining())
+            page.locator(REVIEW_SELECTORS['sort']).first.click(timeout=deadline.remaining())
+            page.locator(REVIEW_SELECTORS['newest']).first.click(timeout=deadline.remaining())
+            page.wait_for_selector(REVIEW_SELECTORS['card'], timeout=deadline.remaining())
+    except PlaywrightTimeoutError:
+        SCRAPER_TIMEOUTS.inc(phase='reviews_open')
+        return False
+    return True
+
+
+def iter_reviews(page, url, known=(), limit=REVIEWS_MAX_PER_PLACE, skip=(), state=None):
+    """Yield the reviews of the place at `url`, newest first, as they are read.
+
+    Stops at the first review whose id is in `known` (the place's cursor), after `limit`
+    reviews, or when scrolling loads no more reviews. Reviews whose id is in `skip` are passed
+    over and do not count toward `limit`.
+
+    When given, `state` is filled in: 'complete' is True once the cursor or the end of the list
+    was reached, and 'newest' holds the ids of the newest reviews seen (read or passed over).
+    """
+    state = {} if state is None else state
+    state['complete'] = False
+    state['newest'] = []
+    deadline = Deadline()
+    with timed(SCRAPER_PHASE_SECONDS, phase='goto'):
+        page.goto(url, wait_until='domcontentloaded', timeout=deadline.remaining())
+    wait_for_panel(page, deadline)
+    if not _open_newest(page, deadline):
+        return
+    if skip:
+        page.evaluate(_SKIP_REVIEWS_JS, list(skip))
+
+    count = 0
+    known = list(known)
+    while True:
+        with timed(SCRAPER_PHASE_SECONDS, phase='reviews_scroll'):
+            batch = page.evaluate(_REVIEWS_JS, {'selectors': REVIEW_SELECTORS, 'known': known})
+        state['newest'] = (state['newest'] + batch['seen'])[:REVIEWS_CURSOR_DEPTH]
+        for index, item in enumerate(batch['items']):
+            item['rating'] = _parse_rating(item['rating'])
+            yield item
+            count += 1
+            if count >= limit:
+                state['complete'] = batch['reached_known'] and index == len(batch['items']) - 1
+                return
+        if batch['reached_known']:
+            state['complete'] = True
+            return
+        try:
+            with timed(SCRAPER_PHASE_SECONDS, phase='reviews_wait'):
+                page.wait_for_function(_MORE_REVIEWS_JS, arg=REVIEW_SELECTORS['card'], timeout=REVIEWS_IDLE_TIMEOUT)
+        except PlaywrightTimeoutError:
+            state['complete'] = True
+            return
+
+
+def load_cursor(conn, place_id):
+    """The place's cursor (newest review ids), its backfill flag and the database time, which stamps this run."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT now(), c.recent_ids, c.backfill
+            FROM (SELECT 1) AS one LEFT JOIN review_cursors c ON c.place_id = %s
+            """,
+            (place_id,)
+        )
+        run_at, recent_ids, backfill = cur.fetchone()
+    conn.commit()
+    return recent_ids or [], bool(backfill), run_at
+
+
+def stored_review_ids(conn, place_id):
+    with conn.cursor() as cur:
+        cur.execute("SELECT review_id FROM place_reviews WHERE place_id = %s", (place_id,))
+        ids = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    return ids
+
+
+@timed(DB_SECONDS, operation='store_reviews')
+def store_reviews(conn, place_id, reviews, run_at):
+    """Store a batch of reviews read in the run started at `run_at`.
+
+    Every batch of a run gets the same scraped_at, so "newest first" (scraped_at DESC, seq) holds
+    however many batches a run commits. Reviews stored by an interrupted earlier run and read
+    again move into this run's order.
+    """
+    if not reviews:
+        return
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            """
+            INSERT INTO place_reviews (place_id, review_id, author, rating, published, text, scraped_at) VALUES %s
+            ON CONFLICT (place_id, review_id) DO UPDATE
+            SET scraped_at = EXCLUDED.scraped_at, seq = EXCLUDED.seq
+            """,
+            [(place_id, r['review_id'], r['author'], r['rating'], r['published'], r['text'], run_at) for r in reviews]
+        )
+    conn.commit()
+
+
+def save_cursor(conn, place_id, recent_ids, new_count, backfill=False):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO review_cursors (place_id, recent_ids, review_count, backfill) VALUES (%s, %s, %s, %s)
+            ON CONFLICT (place_id) DO UPDATE
+            SET recent_ids = EXCLUDED.recent_ids,
+                review_count = review_cursors.review_count + EXCLUDED.review_count,
+                backfill = EXCLUDED.backfill,
+                updated_at = now()
+            """,
+            (place_id, recent_ids, new_count, backfill)
+        )
+    conn.commit()
+
+
+def scrape_place_reviews(conn, page, place_id, url=None, limit=REVIEWS_MAX_PER_PLACE):
+    """Read the reviews of one place newer than its cursor, storing them in batches as they are read.
+
+    The cursor only moves once the run reaches it or the end of the list, so an interrupted run
+    reads the same reviews again next time (they are stored once). A run that stops at `limit`
+    first leaves the cursor where it was and sets the backfill flag; the next run then passes
+    over the reviews already stored and reads on from where this one stopped. Returns the
+    number of new reviews.
+    """
+    cursor, backfill, run_at = load_cursor(conn, place_id)
+    skip = stored_review_ids(conn, place_id) if backfill else ()
+    state = {}
+    new_ids = []
+    batch = []
+    for review in iter_reviews(page, url or place_url(place_id), cursor, limit, skip, state):
+        new_ids.append(review['review_id'])
+        batch.append(review)
+        if len(batch) >= REVIEWS_BATCH_SIZE:
+            store_reviews(conn, place_id, batch, run_at)
+            batch = []
+    store_reviews(conn, place_id, batch, run_at)
+    if state['complete']:
+        recent = list(dict.fromkeys(state['newest'] + cursor))[:REVIEWS_CURSOR_DEPTH]
+        save_cursor(conn, place_id, recent, len(new_ids))
+    elif new_ids:
+        save_cursor(conn, place_id, cursor, len(new_ids), backfill=True)
+    return len(new_ids)
+
+
+def get_reviews(place_id, limit=100):
+    """Stored reviews of a place, newest first, with its cursor row (or None)."""
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection error")
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT review_id, author, rating, published, text, scraped_at FROM place_reviews
+                WHERE place_id = %s ORDER BY scraped_at DESC, seq LIMIT %s
+                """,
+                (place_id, limit)
+            )
+            rows = cur.fetchall()
+            cur.execute("SELECT review_count, updated_at FROM review_cursors WHERE place_id = %s", (place_id,))
+            cursor = cur.fetchone()
+        return rows, cursor
+    finally:
+        conn.close()
@@ -0,0 +1,390 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from browser_pool import get_pool
+from extractors import Deadline, extract_place, mark_panel, wait_for_panel
+from harvest import PLACE_LINK_SELECTOR, iter_listings
+from metrics import (
+    SCRAPER_ERRORS, SCRAPER_LISTING_SECONDS, SCRAPER_LISTINGS, SCRAPER_PHASE_SECONDS, SCRAPER_TIMEOUTS,
+    run_in_context, timed,
+)
+from normalize import listings_frame, normalize_records
+
+# Google Maps entry point; point it at a local fixture server (see benchmarks/) to scrape offline
+MAPS_BASE_URL = os.getenv('MAPS_BASE_URL', 'https://www.google.com/maps').rstrip('/')
+
+# Number of listing detail panels extracted at once (1 keeps the original click-through path)
+SCRAPER_FANOUT = int(os.getenv('SCRAPER_FANOUT', 1))
+SCRAPER_MAX_FANOUT = int(os.getenv('SCRAPER_MAX_FANOUT', 8))
+# Harvested places waiting for a detail thread (0 means twice the fan-out)
+SCRAPER_QUEUE_SIZE = int(os.getenv('SCRAPER_QUEUE_SIZE', 0))
+
+# Threads that run streamed scrapes for callers outside the scraper (e.g. web requests)
+SCRAPER_STREAM_THREADS = int(os.getenv('SCRAPER_STREAM_THREADS', 2))
+
+# Scraper threads live as long as the process so their browser pools stay warm
+_detail_executor = None
+_stream_executor = None
+_detail_executor_lock = threading.Lock()
+
+_END_OF_STREAM = object()
+
+
+def extract_listing(page, place_id=None):
+    # Raw field text only; parsing happens in batches in normalize.py
+    record = extract_place(page)
+    record['place_id'] = place_id
+    return record
+
+
+def _get_detail_executor():
+    global _detail_executor
+    with _detail_executor_lock:
+        if _detail_executor is None:
+            _detail_executor = ThreadPoolExecutor(max_workers=SCRAPER_MAX_FANOUT, thread_name_prefix='scraper-detail')
+        return _detail_executor
+
+
+def _consume(work, done, page, stop):
+    # Returns True once the end-of-work sentinel has been taken, or any item after `stop` is set
+    while True:
+        item = work.get()
+        if item is None or stop.is_set():
+            return True
+        index, listing = item
+        row = None
+        if page is None:
+            # This thread has no browser page, so the place is dropped; counted so it shows
+            SCRAPER_ERRORS.inc(phase='detail_pool')
+        else:
+            try:
+                with timed(SCRAPER_LISTING_SECONDS):
+                    # Navigation and the panel wait share one budget per listing
+                    deadline = Deadline()
+                    with timed(SCRAPER_PHASE_SECONDS, phase='goto'):
+                        page.goto(listing['url'], wait_until='domcontentloaded', timeout=deadline.remaining())
+                    wait_for_panel(page, deadline)
+                    row = extract_listing(page, listing['place_id'])
+            except PlaywrightTimeoutError as e:
+                SCRAPER_TIMEOUTS.inc(phase='detail')
+                print(f"Timeout processing listing {listing['url']}: {e}")
+            except Exception as e:
+                SCRAPER_ERRORS.inc(phase='detail')
+                print(f"Error processing listing {listing['url']}: {e}")
+        done.put((index, row, page is not None))
+
+
+def _detail_consumer(work, done, stop, failed):
+    # Runs on a detail thread: one context from that thread's pool serves every place it takes
+    finished = False
+    opened = False
+    try:
+        with get_pool().page() as page:
+            opened = True
+            finished = _consume(work, done, page, stop)
+    except Exception as e:
+        print(f"Error in detail worker: {e}")
+        if not opened:
+            failed.append(e)
+    if not finished:
+        # Keep taking work so the producer never blocks on a full queue
+        _consume(work, done, None, stop)
+
+
+def iter_extract_concurrently(listings, fanout, progress=None):
+    """Extract harvested listings on `fanout` detail threads while `listings` is still being produced.
+
+    `listings` may be a generator (e.g. the feed harvest); the bounded work queue holds it back
+    when the detail threads fall behind. Records are yielded in lists, in the order of `listings`,
+    as soon as they and every record before them are done; failed listings are skipped.
+
+    Raises RuntimeError when no detail thread could open a browser page, rather than ending
+    with the places silently missing.
+    """
+    consumers = max(1, min(fanout, SCRAPER_MAX_FANOUT))
+    work = queue.Queue(maxsize=SCRAPER_QUEUE_SIZE or consumers * 2)
+    done = queue.Queue()
+    # Set when the generator is closed early: the detail threads drop the rest of the work
+    stop = threading.Event()
+    # Errors of detail threads that could not open a page
+    failed = []
+    rows = {}
+    submitted = 0
+    finished = 0
+    pageless = 0
+    emitted = 0
+
+    def collect(block):
+        nonlocal finished, pageless
+        while finished < submitted:
+            try:
+                index, row, had_page = done.get(block=block)
+            except queue.Empty:
+                return
+            rows[index] = row
+            finished += 1
+            pageless += not had_page
+            if progress:
+                progress(finished, submitted)
+
+    def check_pages():
+        if len(failed) == consumers or (submitted and pageless == submitted):
+            error = failed[0] if failed else None
+            raise RuntimeError(f"No detail thread could open a browser page: {error}")
+
+    def put(item):
+        # Never blocks for long, so finished records are collected while the queue is full
+        while True:
+            try:
+                work.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                collect(block=False)
+
+    def ready():
+        # Keep the feed order of the serial path
+        nonlocal emitted
+        batch = []
+        while emitted in rows:
+            row = rows.pop(emitted)
+            emitted += 1
+            if row is not None:
+                batch.append(row)
+        if batch:
+            yield batch
+
+    executor = _get_detail_executor()
+    # Detail threads record their spans in the caller's trace, if any
+    workers = [executor.submit(run_in_context(_detail_consumer), work, done, stop, failed)
+               for _ in range(consumers)]
+    produced = False
+    try:
+        for listing in listings:
+            check_pages()
+            put((submitted, listing))
+            submitted += 1
+            collect(block=False)
+            yield from ready()
+        produced = True
+    finally:
+        if not produced:
+            stop.set()
+        for _ in workers:
+            if not stop.is_set():
+                put(None)
+                continue
+            try:
+                work.put_nowait(None)
+            except queue.Full:
+                # Every detail thread takes one of the queued places, sees `stop` and returns
+                pass
+
+    while finished < submitted:
+        collect(block=True)
+        check_pages()
+        yield from ready()
+    check_pages()
+    yield from ready()
+
+
+def resume_first(pending, listings):
+    """Yield the `pending` places (e.g. from a job checkpoint), then `listings` without them."""
+    seen = set()
+    for listing in chain(pending, listings):
+        if listing['place_id'] in seen:
+            continue
+        seen.add(listing['place_id'])
+        yield listing
+
+
+def _iter_serial(page, listings, progress=None):
+    for index, listing in enumerate(listings):
+        if progress:
+            progress(index, len(listings))
+        try:
+            with timed(SCRAPER_LISTING_SECONDS):
+                deadline = Deadline()
+                # The panel of the last listing stays up until the click replaces it
+                previous = mark_panel(page)
+                with timed(SCRAPER_PHASE_SECONDS, phase='click'):
+                    page.locator(f'a[data-harvest-index="{listing["index"]}"]').click(timeout=deadline.remaining())
+                wait_for_panel(page, deadline, previous)
+                record = extract_listing(page, listing['place_id'])
+        except PlaywrightTimeoutError as e:
+            SCRAPER_TIMEOUTS.inc(phase='detail')
+            print(f"Timeout processing listing: {e}")
+            continue
+        except Exception as e:
+            SCRAPER_ERRORS.inc(phase='detail')
+            print(f"Error processing listing: {e}")
+            continue
+        yield [record]
+
+
+def iter_scrape(search_for, total=10, progress=None, fanout=None, skip=None, timings=None, resume=None):
+    """Yield a typed Listing for each place of a search as soon as it is extracted.
+
+    Listings are deduplicated on name, phone number and address. Harvested places for which
+    `skip(listing)` returns True (e.g. scraped by another search) are not opened; `skip` is
+    called on the consuming thread. Must be consumed on one thread.
+
+    `resume` lists places harvested by an earlier, interrupted run; with a fan-out above 1 they
+    are extracted right away, ahead of the feed. The click-through path finds them in the feed.
+
+    When given, `timings` is filled with phase durations in seconds: load, search, harvest
+    (serial path only), first_listing (since the start), extract and total.
+    """
+    fanout = fanout or SCRAPER_FANOUT
+    seen = set()
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+
+    # Borrow an isolated context from the warm browser pool instead of launching Chromium
+    with get_pool().page() as page:
+        print(f"Info: Browser page checked out for scraping.")
+
+        try:
+            with timed(SCRAPER_PHASE_SECONDS, phase='load'):
+                page.goto(MAPS_BASE_URL)
+                page.wait_for_selector('//input[@id="searchboxinput"]')
+            print(f"Info: Page loaded and search box found.")
+            timings['load'] = time.perf_counter() - started
+        except Exception as e:
+            if isinstance(e, PlaywrightTimeoutError):
+                SCRAPER_TIMEOUTS.inc(phase='load')
+            print(f"Error loading the page or waiting for selector: {e}")
+            raise
+
+        try:
+            with timed(SCRAPER_PHASE_SECONDS, phase='search'):
+                page.locator('//input[@id="searchboxinput"]').fill(search_for)
+                page.keyboard.press("Enter")
+                page.wait_for_selector(PLACE_LINK_SELECTOR)
+        except PlaywrightTimeoutError:
+            SCRAPER_TIMEOUTS.inc(phase='search')
+            raise
+        print(f"Info: Search term '{search_for}' entered and search started.")
+        searched = time.perf_counter()
+        timings['search'] = searched - started - timings['load']
+
+        harvested = iter_listings(page, total)
+        if resume and fanout > 1:
+            harvested = resume_first(resume, harvested)
+        if skip:
+            harvested = (listing for listing in harvested if not skip(listing))
+
+        if fanout > 1:
+            # Detail threads start on the first harvested places while the feed keeps scrolling
+            print(f"Info: Extracting listings with a fan-out of {fanout} while harvesting.")
+            batches = iter_extract_concurrently(harvested, fanout, progress)
+        else:
+            # Collect distinct places from the feed before any detail extraction
+            harvested = list(harvested)
+            timings['harvest'] = time.perf_counter() - searched
+            batches = _iter_serial(page, harvested, progress)
+
+        for batch in batches:
+            with timed(SCRAPER_PHASE_SECONDS, phase='normalize'):
+                normalized = normalize_records(batch)
+            SCRAPER_LISTINGS.inc(len(batch))
+            for listing in normalized:
+                if listing.key() in seen:
+                    continue
+                seen.add(listing.key())
+                timings.setdefault('first_listing', time.perf_counter() - started)
+                yield listing
+
+        finished = time.perf_counter()
+        timings['extract'] = finished - searched
+        timings['total'] = finished - started
+
+
+def scrape_data(search_for, total=10, progress=None, fanout=None, timings=None):
+    try:
+        listings = list(iter_scrape(search_for, total=total, progress=progress, fanout=fanout, timings=timings))
+
+        # Typed DataFrame construction; results are persisted by the caller (see places_store)
+        df = listings_frame(listings)
+
+        print(f"Info: Scraped {len(df)} listings for '{search_for}'.")
+
+        return df
+
+    except Exception as e:
+        print(f"Error during scraping: {e}")
+        return None
+
+
+def _get_stream_executor():
+    global _stream_executor
+    with _detail_executor_lock:
+        if _stream_executor is None:
+            _stream_executor = ThreadPoolExecutor(max_workers=SCRAPER_STREAM_THREADS, thread_name_prefix='scraper-stream')
+        return _stream_executor
+
+
+def _warm_thread(barrier):
+    # Every task waits for the others, so each one lands on (and warms) its own executor thread
+    try:
+        barrier.wait(timeout=30)
+    except threading.BrokenBarrierError:
+        pass
+    get_pool().warm()
+
+
+def warm_up(detail_threads=None):
+    """Start Playwright and the pooled browsers of every stream thread in the background.
+
+    With a fan-out above 1 (default SCRAPER_FANOUT) that many detail threads are warmed too.
+    Returns the futures of the warm-up tasks.
+    """
+    if detail_threads is None:
+        detail_threads = SCRAPER_FANOUT if SCRAPER_FANOUT > 1 else 0
+    detail_threads = min(detail_threads, SCRAPER_MAX_FANOUT)
+    futures = []
+    for executor, count in ((_get_stream_executor(), SCRAPER_STREAM_THREADS), (_get_detail_executor(), detail_threads)):
+        if count:
+            barrier = threading.Barrier(count)
+            futures.extend(executor.submit(_warm_thread, barrier) for _ in range(count))
+    return futures
+
+
+def stream_scrape(search_for, total=10, fanout=None):
+    """Run iter_scrape on a long-lived scraper thread and yield its listings on the calling thread.
+
+    Lets short-lived threads (e.g. web requests) stream a scrape while the browser work stays
+    on threads whose pools are warm. Closing the generator (e.g. the client went away) cancels
+    the scrape: no further place is opened and the scraper thread is freed.
+    """
+    rows = queue.Queue()
+    cancelled = threading.Event()
+
+    def run():
+        try:
+            # Once cancelled, the remaining harvested places are skipped instead of extracted
+            for listing in iter_scrape(search_for, total=total, fanout=fanout, skip=lambda place: cancelled.is_set()):
+                if cancelled.is_set():
+                    break
+                rows.put(listing)
+        except Exception as e:
+            rows.put(e)
+        finally:
+            rows.put(_END_OF_STREAM)
+
+    _get_stream_executor().submit(run)
+    try:
+        while True:
+            item = rows.get()
+            if item is _END_OF_STREAM:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
@@ -0,0 +1,201 @@
+import math
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import quote_plus
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from browser_pool import get_pool
+from harvest import PLACE_LINK_SELECTOR, coords_from_url, iter_listings, place_id_from_url
+from metrics import SCRAPER_PHASE_SECONDS, SCRAPER_TIMEOUTS, run_in_context, timed
+from normalize import normalize_records
+from scraper import MAPS_BASE_URL, SCRAPER_MAX_FANOUT, iter_extract_concurrently, resume_first
+
+# Tiles searched at once, each on its own long-lived thread and browser pool
+TILE_THREADS = int(os.getenv('TILE_THREADS', 4))
+# Zoom level of the initial grid; dense tiles are split further
+TILE_START_ZOOM = int(os.getenv('TILE_START_ZOOM', 13))
+# A tile whose feed returns this many places is probably capped and is split into quarters
+TILE_SPLIT_AT = int(os.getenv('TILE_SPLIT_AT', 100))
+TILE_MAX_DEPTH = int(os.getenv('TILE_MAX_DEPTH', 4))
+TILE_MAX_TILES = int(os.getenv('TILE_MAX_TILES', 400))
+# Largest result count of a tiled search
+TILE_MAX_RESULTS = int(os.getenv('TILE_MAX_RESULTS', 2000))
+# How long a tile may take to show its first result before it is treated as empty (ms)
+TILE_LOAD_TIMEOUT = int(os.getenv('TILE_LOAD_TIMEOUT', 15000))
+
+# Playwright's default viewport, which the pooled contexts use
+VIEWPORT_WIDTH, VIEWPORT_HEIGHT = 1280, 720
+# The feed never exposes more than this many places per search
+_FEED_LIMIT = 500
+
+_tile_executor = None
+_tile_executor_lock = threading.Lock()
+
+
+def _mercator_y(lat):
+    return math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+
+
+class Tile:
+    """A lat/lng box searched through one coordinate-anchored Maps URL."""
+
+    __slots__ = ('south', 'west', 'north', 'east', 'depth')
+
+    def __init__(self, south, west, north, east, depth=0):
+        self.south = south
+        self.west = west
+        self.north = north
+        self.east = east
+        self.depth = depth
+
+    def center(self):
+        return (self.south + self.north) / 2, (self.west + self.east) / 2
+
+    def zoom(self):
+        # Highest zoom at which the viewport still shows the whole tile
+        lng_zoom = math.log2(VIEWPORT_WIDTH * 360 / (256 * (self.east - self.west)))
+        lat_span = _mercator_y(self.north) - _mercator_y(self.south)
+        lat_zoom = math.log2(VIEWPORT_HEIGHT * 2 * math.pi / (256 * lat_span))
+        return max(3, min(21, math.floor(min(lng_zoom, lat_zoom))))
+
+    def url(self, keyword):
+        lat, lng = self.center()
+        return f"{MAPS_BASE_URL}/search/{quote_plus(keyword)}/@{lat:.6f},{lng:.6f},{self.zoom()}z"
+
+    def contains(self, lat, lng):
+        return self.south <= lat <= self.north and self.west <= lng <= self.east
+
+    def split(self):
+        lat, lng = self.center()
+        depth = self.depth + 1
+        return [
+            Tile(self.south, self.west, lat, lng, depth),
+            Tile(self.south, lng, lat, self.east, depth),
+            Tile(lat, self.west, self.north, lng, depth),
+            Tile(lat, lng, self.north, self.east, depth),
+        ]
+
+    def __repr__(self):
+        return f"<Tile {self.south:.4f},{self.west:.4f},{self.north:.4f},{self.east:.4f} depth {self.depth}>"
+
+
+def parse_bounds(value):
+    """Validate a bounding box given as [south, west, north, east] or "south,west,north,east"."""
+    if isinstance(value, str):
+        value = value.split(',')
+    try:
+        south, west, north, east = (float(part) for part in value)
+    except (TypeError, ValueError):
+        raise ValueError("bounds must be [south, west, north, east]")
+    if not (-85 <= south < north <= 85 and -180 <= west < east <= 180):
+        raise ValueError("bounds must satisfy -85 <= south < north <= 85 and -180 <= west < east <= 180")
+    return [south, west, north, east]
+
+
+def initial_tiles(area):
+    """Cover `area` with a grid of tiles about the size of one viewport at TILE_START_ZOOM."""
+    lng_step = VIEWPORT_WIDTH * 360 / (256 * 2 ** TILE_START_ZOOM)
+    # Degrees of latitude shown at the area's center, from the Mercator scale there
+    lat_step = lng_step * VIEWPORT_HEIGHT / VIEWPORT_WIDTH * math.cos(math.radians(area.center()[0]))
+    cols = max(1, math.ceil((area.east - area.west) / lng_step))
+    rows = max(1, math.ceil((area.north - area.south) / lat_step))
+    if cols * rows > TILE_MAX_TILES:
+        raise ValueError(f"Area needs {cols * rows} tiles at zoom {TILE_START_ZOOM}, more than {TILE_MAX_TILES}")
+
+    width = (area.east - area.west) / cols
+    height = (area.north - area.south) / rows
+    return [
+        Tile(area.south + row * height, area.west + col * width,
+             area.south + (row + 1) * height, area.west + (col + 1) * width)
+        for row in range(rows) for col in range(cols)
+    ]
+
+
+def _get_tile_executor():
+    global _tile_executor
+    with _tile_executor_lock:
+        if _tile_executor is None:
+            _tile_executor = ThreadPoolExecutor(max_workers=TILE_THREADS, thread_name_prefix='scraper-tile')
+        return _tile_executor
+
+
+def harvest_tile(keyword, tile):
+    """Every place link in the feed of one tile search (runs on a tile thread)."""
+    with get_pool().page() as page:
+        try:
+            with timed(SCRAPER_PHASE_SECONDS, phase='tile_load'):
+                page.goto(tile.url(keyword))
+                page.wait_for_selector(PLACE_LINK_SELECTOR, timeout=TILE_LOAD_TIMEOUT)
+        except PlaywrightTimeoutError:
+            SCRAPER_TIMEOUTS.inc(phase='tile_load')
+            if '/maps/place/' in page.url:
+                # A single match opens its place page instead of a feed
+                return [{'place_id': place_id_from_url(page.url), 'url': page.url, 'index': None}]
+            return []
+        return list(iter_listings(page, _FEED_LIMIT))
+
+
+def iter_tile_places(keyword, area, tiles, limit=None):
+    """Search `tiles` in parallel and yield each place inside `area` once, as tiles finish.
+
+    Tiles whose feed looks capped are split into quarters, which are searched as well.
+    """
+    executor = _get_tile_executor()
+    harvest = run_in_context(harvest_tile)
+    pending = {executor.submit(harvest, keyword, tile): tile for tile in tiles}
+    seen = set()
+    searched = 0
+
+    try:
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                tile = pending.pop(future)
+                searched += 1
+                try:
+                    places = future.result()
+                except Exception as e:
+                    print(f"Error searching {tile}: {e}")
+                    continue
+
+                if len(places) >= TILE_SPLIT_AT and tile.depth < TILE_MAX_DEPTH:
+                    # The places found so far are still used; the quarters find the rest
+                    for child in tile.split():
+                        pending[executor.submit(harvest, keyword, child)] = child
+
+                for place in places:
+                    coords = coords_from_url(place['url'])
+                    if coords and not area.contains(*coords):
+                        continue
+                    if place['place_id'] in seen:
+                        continue
+                    seen.add(place['place_id'])
+                    yield place
+                    if limit and len(seen) >= limit:
+                        return
+    finally:
+        for future in pending:
+            future.cancel()
+        print(f"Info: Searched {searched} tiles, found {len(seen)} places.")
+
+
+def iter_tiled_scrape(keyword, bounds, total=None, progress=None, fanout=None, skip=None, resume=None):
+    """Yield a typed Listing for each place matching `keyword` inside `bounds`, deduplicated by place id.
+
+    Tile searches and detail extraction overlap: places are extracted while other tiles are
+    still being searched. `skip` and `resume` work as in iter_scrape. The calling thread needs no browser.
+    """
+    area = Tile(*parse_bounds(bounds))
+    tiles = initial_tiles(area)
+    print(f"Info: Tiled search for '{keyword}' over {len(tiles)} tiles.")
+
+    places = iter_tile_places(keyword, area, tiles, total or TILE_MAX_RESULTS)
+    if resume:
+        places = resume_first(resume, places)
+    if skip:
+        places = (place for place in places if not skip(place))
+
+    for batch in iter_extract_concurrently(places, fanout or SCRAPER_MAX_FANOUT, progress):
+        yield from normalize_records(batch)
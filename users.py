@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+import uuid
+
+from sqlalchemy import event, text
+
+from metrics import DB_SECONDS, timed
+from model import db
+
+# Seconds a profile read may be served from memory; updates through this module invalidate it
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 30))
+
+# Prepared once per pooled connection (see init_app), then run with EXECUTE
+_PREPARED = {
+    'user_by_email': "PREPARE user_by_email (text) AS SELECT user_id, name, email, password FROM users WHERE email = $1",
+    'profile_by_email': "PREPARE profile_by_email (text) AS SELECT name, email FROM users WHERE email = $1",
+}
+
+_ADD_USER = text("INSERT INTO users (user_id, name, email, password) VALUES (:user_id, :name, :email, :password)")
+_UPDATE_NAME = text("UPDATE users SET name = :name WHERE email = :email")
+_UPDATE_PASSWORD = text("UPDATE users SET password = :password WHERE email = :email")
+
+_profiles = {}
+_profiles_lock = threading.Lock()
+
+
+def _prepare_statements(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for statement in _PREPARED.values():
+            cursor.execute(statement)
+        dbapi_connection.commit()
+    finally:
+        cursor.close()
+
+
+def init_app(app):
+    # Every connection the pool opens gets the prepared lookups
+    with app.app_context():
+        event.listen(db.engine, 'connect', _prepare_statements)
+
+
+def _execute_prepared(name, email):
+    with db.engine.connect() as conn:
+        return conn.exec_driver_sql(f"EXECUTE {name} (%s)", (email,)).mappings().first()
+
+
+@timed(DB_SECONDS, operation='user_by_email')
+def get_user_by_email(email):
+    """Return the user row (user_id, name, email, password hash) or None."""
+    return _execute_prepared('user_by_email', email)
+
+
+def get_profile(email):
+    """Return {'name', 'email'} for a user or None, served from a short-lived cache."""
+    now = time.monotonic()
+    with _profiles_lock:
+        cached = _profiles.get(email)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    with timed(DB_SECONDS, operation='profile_by_email'):
+        row = _execute_prepared('profile_by_email', email)
+    profile = dict(row) if row else None
+    if profile:
+        with _profiles_lock:
+            _profiles[email] = (now + USER_CACHE_TTL, profile)
+    return profile
+
+
+def invalidate_profile(email):
+    with _profiles_lock:
+        _profiles.pop(email, None)
+
+
+@timed(DB_SECONDS, operation='add_user')
+def add_user(name, email, password_hash):
+    with db.engine.begin() as conn:
+        conn.execute(_ADD_USER, {'user_id': str(uuid.uuid4()), 'name': name, 'email': email, 'password': password_hash})
+
+
+def update_name(email, name):
+    with db.engine.begin() as conn:
+        conn.execute(_UPDATE_NAME, {'name': name, 'email': email})
+    invalidate_profile(email)
+
+
+def update_password(email, password_hash):
+    with db.engine.begin() as conn:
+        conn.execute(_UPDATE_PASSWORD, {'password': password_hash, 'email': email})
+    invalidate_profile(email)
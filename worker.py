@@ -0,0 +1,397 @@
+import argparse
+import multiprocessing
+import os
+import socket
+import time
+from contextlib import nullcontext
+
+import bulk
+import campaign
+import checkpoints
+import contacts
+import jobs
+import places_store
+import reviews
+from browser_pool import get_pool
+from cache import cache_key, search_cache
+import cache
+from calls import make_call
+from contacts import contact_index
+from db import get_db_connection
+from exporters import open_exporter
+from freshness import PLACE_REFRESH_TTL, PlaceFreshness
+from listing import Listing
+from metrics import JOB_TRACE, Trace, serve
+from scraper import iter_scrape
+from tiling import iter_tiled_scrape
+
+SCRAPE_WORKERS = int(os.getenv('SCRAPE_WORKERS', 2))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 5))
+# First port of the per-process /metrics exporters (worker slot N serves on port + N); 0 disables them
+WORKER_METRICS_PORT = int(os.getenv('WORKER_METRICS_PORT', 0))
+
+
+def process_job(conn, job):
+    # With tracing on (per job, or JOB_TRACE for all jobs) every timed phase is written to a trace file
+    trace = Trace(str(job['job_id'])) if job['payload'].get('trace') or JOB_TRACE else None
+    with trace or nullcontext():
+        _process_job(conn, job, trace)
+
+
+def _process_job(conn, job, trace):
+    job_id = str(job['job_id'])
+    payload = job['payload']
+    search_term = payload['search_term']
+    print(f"Info: Processing job {job_id} for '{search_term}' (attempt {job['attempts']}).")
+
+    def report(done, total):
+        jobs.update_progress(conn, job_id, done, total)
+
+    total = payload.get('total', 10)
+
+    try:
+        # Each job gets its own export file, written as rows arrive
+        exporter = open_exporter(job_id, payload.get('export_format'))
+    except Exception as e:
+        print(f"Error opening export for job {job_id}: {e}")
+        jobs.fail_job(conn, job_id, str(e))
+        return
+
+    listings = []
+    bounds = payload.get('bounds')
+    key = cache_key(search_term, total, bounds)
+    bulk_id = payload.get('bulk_id')
+    shared = []
+    # Opt-in: leave out places and phone numbers any earlier job has scraped
+    skip_known = bool(payload.get('skip_known'))
+    known = []
+    if skip_known:
+        contact_index.ensure_loaded(conn)
+    # Refresh mode: stored places that are recent, or whose feed card shows an unchanged header,
+    # are reused without opening them
+    freshness = PlaceFreshness(conn, payload.get('max_age', PLACE_REFRESH_TTL)) if payload.get('refresh') else None
+    reused = []
+    # Listings already in the result (restored or reused), so extracted duplicates are dropped
+    seen_keys = set()
+
+    # Places harvested and listings finished so far are checkpointed, so a retry picks up
+    # where an interrupted attempt stopped
+    checkpoint = checkpoints.JobCheckpoint(conn, job_id)
+    try:
+        checkpoint.load()
+    except Exception as e:
+        print(f"Error loading the checkpoint of job {job_id}, starting over: {e}")
+        conn.rollback()
+
+    def skip(listing):
+        if checkpoint.is_done(listing['place_id']):
+            return True
+        if skip_known and contact_index.knows_place(listing['place_id']):
+            known.append(listing['place_id'])
+            return True
+        # Within a bulk job each place is scraped by whichever search claims it first
+        if bulk_id and not bulk.claim_place(conn, bulk_id, job_id, listing['place_id']):
+            shared.append(listing['place_id'])
+            return True
+        stored = freshness.reuse(listing) if freshness else None
+        if stored is not None:
+            reused.append(stored.place_id)
+            seen_keys.add(stored.key())
+            exporter.write(stored)
+            listings.append(stored)
+            return True
+        checkpoint.harvested(listing)
+        return False
+
+    def scrape():
+        for listing in checkpoint.restored():
+            seen_keys.add(listing.key())
+            exporter.write(listing)
+            listings.append(listing)
+
+        if bounds:
+            # Tiled search over a bounding box instead of one free-text search
+            scraped = iter_tiled_scrape(search_term, bounds, total=total, progress=report,
+                                        fanout=payload.get('fanout'), skip=skip, resume=checkpoint.pending())
+        else:
+            scraped = iter_scrape(search_term, total=total, progress=report, fanout=payload.get('fanout'),
+                                  skip=skip, resume=checkpoint.pending())
+        try:
+            for listing in scraped:
+                if listing.key() in seen_keys:
+                    continue
+                if skip_known and contact_index.knows_phone(listing.phone_e164):
+                    # A new place id for a business whose number is already known
+                    known.append(listing.place_id)
+                    continue
+                exporter.write(listing)
+                listings.append(listing)
+                checkpoint.finished(listing)
+                if freshness:
+                    freshness.extracted(listing)
+        finally:
+            # Whatever was finished before a failure is kept for the retry
+            try:
+                checkpoint.flush()
+            except Exception as e:
+                print(f"Error writing the checkpoint of job {job_id}: {e}")
+                conn.rollback()
+        return [listing.to_row() for listing in listings]
+
+    try:
+        try:
+            if skip_known or freshness:
+                # Only places never seen before (or refreshed places) are wanted, which a cached
+                # result cannot tell apart
+                results, cache_info = scrape(), {'status': 'miss', 'age': None}
+            elif bulk_id:
+                # Bulk searches leave out places claimed by their siblings, so their results
+                # are partial and never stored in the cache
+                cached = search_cache.get(key)
+                if cached:
+                    results, cache_info = cached[0], {'status': 'hit', 'age': cached[1]}
+                else:
+                    results, cache_info = scrape(), {'status': 'miss', 'age': None}
+            else:
+                # Identical searches that are cached or already being scraped elsewhere share one result
+                results, cache_info = search_cache.get_or_compute(key, scrape)
+            if results is not None and cache_info['status'] != 'miss':
+                listings = [Listing.from_row(row) for row in results]
+                for listing in listings:
+                    exporter.write(listing)
+        finally:
+            exporter.close()
+    except Exception as e:
+        print(f"Error scraping data for job {job_id}: {e}")
+        jobs.fail_job(conn, job_id, str(e), retry=True)
+        return
+
+    if results is None:
+        jobs.fail_job(conn, job_id, "An error occurred during data scraping", retry=True)
+        return
+
+    if bulk_id:
+        try:
+            bulk.settle_claims(conn, bulk_id, job_id, [listing.place_id for listing in listings if listing.place_id])
+        except Exception as e:
+            print(f"Error settling the place claims of job {job_id}: {e}")
+            conn.rollback()
+
+    try:
+        places_store.save_run(search_term, total, listings, job_id=job_id, fresh=cache_info['status'] == 'miss',
+                              reused=reused)
+        if freshness:
+            freshness.mark_checked()
+    except Exception as e:
+        print(f"Error storing places for job {job_id}: {e}")
+        conn.rollback()
+
+    try:
+        contact_index.record_scraped(conn, listings)
+    except Exception as e:
+        print(f"Error updating the contact index for job {job_id}: {e}")
+        conn.rollback()
+
+    call_result = None
+    # Jobs queued before job_credentials existed still carry the config in their payload
+    twilio_config = jobs.get_credentials(conn, job_id).get('twilio_config') or payload.get('twilio_config')
+    if payload.get('message') and twilio_config:
+        # Make a call using the VAPI API once the results are in
+        call_result = make_call(
+            twilio_config.get('twilioPhoneNumber'),
+            twilio_config.get('customerPhoneNumber'),
+            payload['message'],
+            twilio_config
+        )
+
+    jobs.complete_job(conn, job_id, {
+        'results': results,
+        'shared': shared,
+        'known': len(known),
+        'refresh': freshness.counts if freshness else None,
+        'call': call_result,
+        'cache': cache_info,
+        'export': {'path': exporter.path, 'rows': exporter.rows},
+        'trace': trace.path if trace else None,
+    })
+    try:
+        checkpoint.clear()
+    except Exception as e:
+        print(f"Error clearing the checkpoint of job {job_id}: {e}")
+        conn.rollback()
+    print(f"Info: Job {job_id} finished with {len(results)} results (cache {cache_info['status']}).")
+
+
+def process_call(conn, job):
+    # The follow-up call of a search answered from the cache
+    job_id = str(job['job_id'])
+    twilio_config = jobs.get_credentials(conn, job_id).get('twilio_config') or {}
+    call_result = make_call(
+        twilio_config.get('twilioPhoneNumber'),
+        twilio_config.get('customerPhoneNumber'),
+        job['payload']['message'],
+        twilio_config
+    )
+    jobs.complete_job(conn, job_id, {'call': call_result})
+    print(f"Info: Job {job_id} placed its call.")
+
+
+def process_campaign(conn, job):
+    job_id = str(job['job_id'])
+    payload = job['payload']
+    campaign_id = payload['campaign_id']
+    print(f"Info: Running campaign {campaign_id} in job {job_id} (attempt {job['attempts']}).")
+
+    def report(done, total):
+        jobs.update_progress(conn, job_id, done, total)
+
+    try:
+        twilio_config = jobs.get_credentials(conn, job_id).get('twilio_config') or payload.get('twilio_config')
+        counts = campaign.run_campaign(conn, campaign_id, twilio_config or {}, progress=report)
+    except Exception as e:
+        print(f"Error running campaign {campaign_id}: {e}")
+        conn.rollback()
+        jobs.fail_job(conn, job_id, str(e), retry=True)
+        return
+
+    jobs.complete_job(conn, job_id, {'campaign_id': campaign_id, 'counts': counts})
+    print(f"Info: Campaign {campaign_id} finished: {counts}.")
+
+
+def process_reviews(conn, job):
+    job_id = str(job['job_id'])
+    payload = job['payload']
+    places = payload['places']
+    limit = payload.get('limit') or reviews.REVIEWS_MAX_PER_PLACE
+    print(f"Info: Reading reviews of {len(places)} places in job {job_id} (attempt {job['attempts']}).")
+
+    counts = {}
+    errors = {}
+    with get_pool().page() as page:
+        for index, place in enumerate(places):
+            jobs.update_progress(conn, job_id, index, len(places))
+            try:
+                counts[place['place_id']] = reviews.scrape_place_reviews(
+                    conn, page, place['place_id'], place.get('url'), limit)
+            except Exception as e:
+                # One place failing leaves the others' cursors intact
+                print(f"Error reading reviews of {place['place_id']}: {e}")
+                conn.rollback()
+                errors[place['place_id']] = str(e)
+
+    if errors and not counts:
+        jobs.fail_job(conn, job_id, f"Reading reviews failed for every place: {next(iter(errors.values()))}",
+                      retry=True)
+        return
+    jobs.complete_job(conn, job_id, {'reviews': {'new': counts, 'errors': errors}})
+    print(f"Info: Job {job_id} stored {sum(counts.values())} new reviews.")
+
+
+def _recover(conn, worker_id):
+    """The worker's connection after an error: rolled back, or replaced when it was lost."""
+    if not conn.closed:
+        try:
+            conn.rollback()
+            return conn
+        except Exception as e:
+            print(f"Error rolling back in worker {worker_id}: {e}")
+    while True:
+        replacement = get_db_connection()
+        if replacement:
+            jobs.listen(replacement)
+            print(f"Info: Worker {worker_id} reconnected to the database.")
+            return replacement
+        time.sleep(JOB_POLL_INTERVAL)
+
+
+def run_worker(worker_id, metrics_port=0):
+    if metrics_port:
+        serve(metrics_port)
+
+    conn = get_db_connection()
+    if not conn:
+        raise SystemExit(f"Worker {worker_id}: database connection error")
+
+    jobs.ensure_schema(conn)
+    bulk.ensure_schema(conn)
+    campaign.ensure_schema(conn)
+    contacts.ensure_schema(conn)
+    checkpoints.ensure_schema(conn)
+    reviews.ensure_schema(conn)
+    cache.ensure_schema(conn)
+    places_store.ensure_schema()
+    jobs.listen(conn)
+    # Launch Chromium before the first job arrives
+    get_pool().warm()
+    print(f"Info: Worker {worker_id} ready.")
+
+    while True:
+        try:
+            job = jobs.claim_job(conn, worker_id)
+        except Exception as e:
+            print(f"Error claiming job in worker {worker_id}: {e}")
+            conn.rollback()
+            time.sleep(JOB_POLL_INTERVAL)
+            continue
+
+        if job is None:
+            jobs.wait_for_jobs(conn, JOB_POLL_INTERVAL)
+            continue
+
+        try:
+            with jobs.Heartbeat(job['job_id'], worker_id):
+                if job['payload'].get('kind') == 'campaign':
+                    process_campaign(conn, job)
+                elif job['payload'].get('kind') == 'reviews':
+                    process_reviews(conn, job)
+                elif job['payload'].get('kind') == 'call':
+                    process_call(conn, job)
+                else:
+                    process_job(conn, job)
+        except Exception as e:
+            # Anything the job did not handle itself fails the job, never the worker
+            print(f"Error: Job {job['job_id']} crashed in worker {worker_id}: {e}")
+            conn = _recover(conn, worker_id)
+            try:
+                jobs.fail_job(conn, str(job['job_id']), str(e), retry=True)
+            except Exception as e:
+                # Left running; the job is re-queued once its heartbeat goes stale
+                print(f"Error failing job {job['job_id']} in worker {worker_id}: {e}")
+                conn = _recover(conn, worker_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scrape job workers")
+    parser.add_argument('--processes', type=int, default=SCRAPE_WORKERS,
+                        help="number of worker processes to run on this node")
+    args = parser.parse_args()
+
+    # Each worker is its own process with its own Playwright driver and browser pool
+    ctx = multiprocessing.get_context('spawn')
+    host = socket.gethostname()
+    workers = {}
+
+    def start(slot):
+        worker_id = f"{host}-{os.getpid()}-{slot}"
+        metrics_port = WORKER_METRICS_PORT + slot if WORKER_METRICS_PORT else 0
+        process = ctx.Process(target=run_worker, args=(worker_id, metrics_port), name=worker_id)
+        process.start()
+        workers[slot] = process
+
+    for slot in range(args.processes):
+        start(slot)
+
+    try:
+        while True:
+            for slot, process in list(workers.items()):
+                if not process.is_alive():
+                    print(f"Error: Worker {process.name} exited with code {process.exitcode}, restarting.")
+                    start(slot)
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for process in workers.values():
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()